@@ -1,6 +1,6 @@
 # app/database.py
 
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, text
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 import os
@@ -37,10 +37,25 @@ def get_db():
     finally:
         db.close()
 
+# Columns added to tables after they were first created, as (table, column, SQL type).
+# create_all never alters an existing table, so upgrade_tables adds them (indexed).
+ADDED_COLUMNS = [
+    ("documents", "batch_id", "VARCHAR"),
+    ("documents", "sha256", "VARCHAR(64)"),
+]
+
 # Initialize database tables
 def create_tables():
-    """Create all database tables"""
+    """Create all database tables, then bring existing ones up to date"""
     Base.metadata.create_all(bind=engine)
+    upgrade_tables()
+
+def upgrade_tables():
+    """Add any ADDED_COLUMNS missing from existing tables; safe to run on every startup"""
+    with engine.begin() as conn:
+        for table, column, sql_type in ADDED_COLUMNS:
+            conn.execute(text(f"ALTER TABLE {table} ADD COLUMN IF NOT EXISTS {column} {sql_type}"))
+            conn.execute(text(f"CREATE INDEX IF NOT EXISTS ix_{table}_{column} ON {table} ({column})"))
 
 def drop_tables():
     """Drop all database tables (use with caution!)"""
@@ -2,30 +2,49 @@
 
 import os
 import logging
+from typing import Any, Dict
+
+import orjson
 from dotenv import load_dotenv
-from fastapi import FastAPI
+from fastapi import FastAPI, Request
+from fastapi.responses import ORJSONResponse, StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
-from openai import OpenAI  
 
+from app.database import create_tables
 from app.routes import workflow, documents
-from app.services.orchestrator import run_workflow
+from app.services import chat_log_writer, embedding_batch, openai_client, pdf_extractor
+from app.services.llm_service import create_chat_completion, is_llm_available
+from app.services.vector_store import init_vector_store
+from app.services.orchestrator import WorkflowDefinition, run_workflow
+from app.workflow.llm_engine import LLMEngineComponent
+from app.workflow.output import OutputComponent
 
 # Load environment variables
 load_dotenv()
 
-OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
 OPENAI_MODEL = os.getenv("OPENAI_MODEL", "gpt-3.5-turbo")
 
-# OpenAI client
-client = OpenAI(api_key=OPENAI_API_KEY) if OPENAI_API_KEY else None
-
 # Logging setup
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger("ai-planet-backend")
 
 # Create FastAPI app
-app = FastAPI(title="AI Planet Backend")
+app = FastAPI(title="AI Planet Backend", default_response_class=ORJSONResponse)
+
+# Refuse oversized uploads from Content-Length, before the body is read and
+# spooled to disk; the route's streaming cap still covers chunked requests.
+# Registered before CORS so the 413 still carries CORS headers.
+@app.middleware("http")
+async def limit_upload_size(request: Request, call_next):
+    if request.url.path == "/documents/upload":
+        length = request.headers.get("content-length", "")
+        if length.isdigit() and int(length) > documents.MAX_UPLOAD_REQUEST_BYTES:
+            return ORJSONResponse(
+                {"detail": f"File too large (max {documents.MAX_UPLOAD_MB}MB)"},
+                status_code=413,
+            )
+    return await call_next(request)
 
 # CORS
 app.add_middleware(
@@ -39,6 +58,47 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Open DB and vector store connections before the first request
+@app.on_event("startup")
+async def warm_up():
+    try:
+        create_tables()
+    except Exception:
+        logger.exception("Database warm-up failed")
+    try:
+        init_vector_store()
+    except Exception:
+        logger.exception("Vector store warm-up failed")
+
+# Background chat log writer
+@app.on_event("startup")
+async def start_chat_log_writer():
+    chat_log_writer.start()
+
+@app.on_event("shutdown")
+async def stop_chat_log_writer():
+    await chat_log_writer.stop()
+
+# Background reconciler for OpenAI embedding batches
+@app.on_event("startup")
+async def start_embedding_batch_reconciler():
+    embedding_batch.start()
+
+@app.on_event("shutdown")
+async def stop_embedding_batch_reconciler():
+    await embedding_batch.stop()
+
+# Stop the PDF extraction worker processes
+@app.on_event("shutdown")
+async def stop_pdf_extraction_pool():
+    pdf_extractor.shutdown_process_pool()
+
+# Close the shared OpenAI connection pool
+@app.on_event("shutdown")
+async def close_openai_client():
+    if openai_client.client is not None:
+        await openai_client.client.close()
+
 # Root endpoint
 @app.get("/")
 def root():
@@ -54,14 +114,14 @@ class ChatRequest(BaseModel):
     query: str
 
 @app.post("/api/chat")
-def chat(req: ChatRequest):
+async def chat(req: ChatRequest):
     logger.info("Received chat request: %s", req.query)
 
-    if not client:
+    if not is_llm_available():
         return {"answer": f"(DEV fallback) Echo: {req.query}"}
 
     try:
-        resp = client.chat.completions.create(
+        resp = await create_chat_completion(
             model=OPENAI_MODEL,
             messages=[{"role": "user", "content": req.query}],
             max_tokens=800,
@@ -72,15 +132,42 @@ def chat(req: ChatRequest):
         logger.exception("Error while calling OpenAI")
         return {"answer": f"(Error calling OpenAI) {str(exc)}"}
 
+def _sse(payload: Dict[str, Any]) -> str:
+    return f"data: {orjson.dumps(payload).decode()}\n\n"
+
+@app.post("/api/chat/stream")
+async def chat_stream(req: ChatRequest):
+    """
+    Answer through the LLM engine (its RAG system prompt and answer cache, unlike
+    /api/chat) and send the answer as server-sent events while it is generated.
+    """
+    logger.info("Received streaming chat request: %s", req.query)
+
+    async def generate():
+        if not is_llm_available():
+            yield _sse({"delta": f"(DEV fallback) Echo: {req.query}"})
+        else:
+            llm = LLMEngineComponent({"model": OPENAI_MODEL, "max_tokens": 800})
+            output = OutputComponent({})
+            try:
+                async for chunk in output.process_stream(llm.process_stream({"query": req.query})):
+                    yield _sse({"delta": chunk})
+            except Exception as exc:
+                logger.exception("Error while streaming from OpenAI")
+                yield _sse({"error": f"(Error calling OpenAI) {str(exc)}"})
+        yield "data: [DONE]\n\n"
+
+    return StreamingResponse(generate(), media_type="text/event-stream")
+
 # Workflow runner
 class WorkflowRunRequest(BaseModel):
-    workflow: dict
+    workflow: WorkflowDefinition
     query: str
 
 @app.post("/api/run_workflow")
-def run_workflow_endpoint(req: WorkflowRunRequest):
+async def run_workflow_endpoint(req: WorkflowRunRequest):
     try:
-        return run_workflow(req.workflow, req.query)
+        return await run_workflow(req.workflow, req.query)
     except Exception as exc:
         logger.exception("Error while running workflow")
         return {"error": str(exc)}
@@ -13,6 +13,8 @@ class Document(Base):
     doc_id = Column(String, unique=True, index=True, nullable=False)
     filename = Column(String, nullable=False)
     uploaded_at = Column(DateTime, default=datetime.utcnow)
+    batch_id = Column(String, nullable=True, index=True)  # pending OpenAI embedding batch, if any
+    sha256 = Column(String(64), nullable=True, index=True)  # hash of the uploaded file, for de-duplication
     
     def __repr__(self):
         return f"<Document(doc_id='{self.doc_id}', filename='{self.filename}')>"
@@ -36,7 +38,7 @@ class ChatLog(Base):
     __tablename__ = "chat_logs"
     
     id = Column(Integer, primary_key=True, index=True)
-    workflow_id = Column(Integer, ForeignKey("workflows.id"), nullable=True)  # reference to workflow
+    workflow_id = Column(Integer, ForeignKey("workflows.id"), nullable=True, index=True)  # reference to workflow
     question = Column(Text, nullable=False)
     answer = Column(Text)
     created_at = Column(DateTime, default=datetime.utcnow)
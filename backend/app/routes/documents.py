@@ -2,23 +2,51 @@
 
 import os
 import uuid
-import shutil
-from fastapi import APIRouter, UploadFile, File, Depends, HTTPException
+import asyncio
+import hashlib
+import aiofiles
+from typing import List, Optional
+from fastapi import APIRouter, UploadFile, File, Depends, HTTPException, Query
+from sqlalchemy import select
 from sqlalchemy.orm import Session
 
 from app.database import get_db
 from app.models import Document as DocumentModel
-from app.services.pdf_extractor import extract_text_from_pdf
-from app.services.vector_store import add_document
+from app.services.embedding_batch import BATCH_CHUNK_THRESHOLD, submit_document_batch
+from app.services.llm_service import is_llm_available
+from app.services.pdf_extractor import iter_pdf_text
+from app.services.chunker import iter_chunks
+from app.services.vector_store import add_chunks
 
 UPLOAD_DIR = "uploads"
+UPLOAD_CHUNK_SIZE = 1 << 20  # 1 MiB
+MAX_UPLOAD_MB = int(os.getenv("MAX_UPLOAD_MB", "50"))
+MAX_UPLOAD_BYTES = MAX_UPLOAD_MB * 1024 * 1024
+# Whole multipart request: the file plus form framing (boundaries, part headers)
+MAX_UPLOAD_REQUEST_BYTES = MAX_UPLOAD_BYTES + 64 * 1024
 router = APIRouter()
 
+def _find_by_sha256(db: Session, sha256: str) -> Optional[DocumentModel]:
+    return db.query(DocumentModel).filter(DocumentModel.sha256 == sha256).first()
+
+def _chunk_pdf(file_path: str) -> List[str]:
+    # Pages go straight into the chunker; the full document text is never built
+    return list(iter_chunks(iter_pdf_text(file_path)))
+
+def _save_document(db: Session, doc_record: DocumentModel) -> None:
+    db.add(doc_record)
+    db.commit()
+    db.refresh(doc_record)
+
 @router.post("/upload")
-def upload_document(file: UploadFile = File(...), db: Session = Depends(get_db)):
+async def upload_document(file: UploadFile = File(...), db: Session = Depends(get_db)):
     # Check if file is PDF
     if not file.filename.lower().endswith('.pdf'):
         raise HTTPException(status_code=400, detail="Only PDF files are supported")
+
+    # Chunks can only be indexed with the OpenAI embedding model
+    if not is_llm_available():
+        raise HTTPException(status_code=503, detail="Embedding service unavailable; set OPENAI_API_KEY")
     
     # Generate unique ID
     doc_id = str(uuid.uuid4())
@@ -28,26 +56,54 @@ def upload_document(file: UploadFile = File(...), db: Session = Depends(get_db))
     os.makedirs(UPLOAD_DIR, exist_ok=True)
     
     try:
-        with open(file_path, "wb") as buffer:
-            shutil.copyfileobj(file.file, buffer)
+        total = 0
+        digest = hashlib.sha256()
+        async with aiofiles.open(file_path, "wb") as buffer:
+            while chunk := await file.read(UPLOAD_CHUNK_SIZE):
+                total += len(chunk)
+                if total > MAX_UPLOAD_BYTES:
+                    raise HTTPException(status_code=413, detail=f"File too large (max {MAX_UPLOAD_MB}MB)")
+                digest.update(chunk)
+                await buffer.write(chunk)
+        sha256 = digest.hexdigest()
 
-        # Extract text & generate embeddings
-        text = extract_text_from_pdf(file_path)
-        if not text.strip():
+        # Identical bytes were already uploaded: reuse that document's text and embeddings
+        # The session is synchronous, so its queries run in a worker thread
+        existing = await asyncio.to_thread(_find_by_sha256, db, sha256)
+        if existing:
+            os.remove(file_path)
+            return {
+                "message": "Document already uploaded; reusing the stored copy",
+                "doc_id": existing.doc_id,
+                "embedding_status": "pending" if existing.batch_id else "ready",
+            }
+
+        # Extract & chunk off the event loop, then embed
+        chunks = await asyncio.to_thread(_chunk_pdf, file_path)
+        if not chunks:
             raise HTTPException(status_code=400, detail="No text could be extracted from the PDF")
-            
-        add_document(doc_id, text)
+        
+        # Large documents go through the Batch API and are indexed once the batch completes
+        batch_id = None
+        if len(chunks) > BATCH_CHUNK_THRESHOLD:
+            batch_id = await submit_document_batch(doc_id, chunks)
+        else:
+            await add_chunks(doc_id, chunks)
 
         # Save metadata in DB
-        doc_record = DocumentModel(doc_id=doc_id, filename=file.filename)
-        db.add(doc_record)
-        db.commit()
-        db.refresh(doc_record)
+        doc_record = DocumentModel(doc_id=doc_id, filename=file.filename, batch_id=batch_id, sha256=sha256)
+        await asyncio.to_thread(_save_document, db, doc_record)
 
         return {
             "message": "Document processed, stored, and saved in DB!",
             "doc_id": doc_id,
+            "embedding_status": "pending" if batch_id else "ready",
         }
+    except HTTPException:
+        # Client errors (too large, no text) keep their status code
+        if os.path.exists(file_path):
+            os.remove(file_path)
+        raise
     except Exception as e:
         # Clean up file if something goes wrong
         if os.path.exists(file_path):
@@ -55,10 +111,26 @@ def upload_document(file: UploadFile = File(...), db: Session = Depends(get_db))
         raise HTTPException(status_code=500, detail=f"Error processing document: {str(e)}")
 
 @router.get("/list")
-def list_documents(db: Session = Depends(get_db)):
-    """List all uploaded documents"""
-    documents = db.query(DocumentModel).all()
-    return {"documents": [{"doc_id": doc.doc_id, "filename": doc.filename, "uploaded_at": doc.uploaded_at} for doc in documents]}
+def list_documents(
+    after_id: Optional[int] = Query(None, description="Cursor: next_after_id from the previous page"),
+    limit: int = Query(100, ge=1, le=1000),
+    db: Session = Depends(get_db),
+):
+    """List uploaded documents, one keyset-paginated page at a time"""
+    # Select plain columns (no ORM objects) and seek by primary key instead of OFFSET
+    stmt = (
+        select(DocumentModel.id, DocumentModel.doc_id, DocumentModel.filename, DocumentModel.uploaded_at)
+        .order_by(DocumentModel.id)
+        .limit(limit)
+    )
+    if after_id is not None:
+        stmt = stmt.where(DocumentModel.id > after_id)
+    rows = db.execute(stmt).all()
+
+    return {
+        "documents": [{"doc_id": row.doc_id, "filename": row.filename, "uploaded_at": row.uploaded_at} for row in rows],
+        "next_after_id": rows[-1].id if len(rows) == limit else None,
+    }
 
 @router.delete("/{doc_id}")
 def delete_document(doc_id: str, db: Session = Depends(get_db)):
@@ -1,10 +1,10 @@
 # app/routes/workflow.py
 
-from fastapi import APIRouter, HTTPException, Depends, status
+from fastapi import APIRouter, HTTPException, Depends, Query, status
 from pydantic import BaseModel
-from sqlalchemy.orm import Session
+from sqlalchemy.orm import Session, defer, raiseload
 from typing import Optional, List, Any, Dict
-import json
+import orjson
 
 # Executor + validator from the workflow package we created
 from app.workflow.executor_safe import execute_workflow_safe
@@ -12,7 +12,8 @@ from app.workflow.validator import WorkflowValidationError as WorkflowValidation
 
 # DB helpers and models (keep these imports as in your project)
 from app.database import get_db
-from app.models import Workflow as WorkflowModel, ChatLog
+from app.models import Workflow as WorkflowModel
+from app.services.chat_log_writer import log_chat
 
 router = APIRouter()
 
@@ -30,7 +31,7 @@ class SaveWorkflowRequest(BaseModel):
 
 
 @router.post("/run")
-def execute_workflow(req: WorkflowRequest, db: Session = Depends(get_db)):
+async def execute_workflow(req: WorkflowRequest):
     """
     Execute a workflow safely.
 
@@ -43,8 +44,10 @@ def execute_workflow(req: WorkflowRequest, db: Session = Depends(get_db)):
     }
     """
     try:
-        # Run the safe executor (validates and executes with tracing/timeouts)
-        res = execute_workflow_safe(req.workflow_definition, req.user_query)
+        # Run the safe executor (validates and executes with tracing/timeouts).
+        # Validation results are cached by definition hash in the validator, so
+        # a saved workflow is only validated on its first run in this process.
+        res = await execute_workflow_safe(req.workflow_definition, req.user_query)
 
         # executor_safe returns a dict; error cases are returned as {"error": ...}
         if isinstance(res, dict) and res.get("error"):
@@ -55,20 +58,13 @@ def execute_workflow(req: WorkflowRequest, db: Session = Depends(get_db)):
         result = res.get("result") if isinstance(res, dict) else res
         trace = res.get("trace") if isinstance(res, dict) else None
 
-        # Persist chat log if DB available (workflow_id may be None)
+        # Queue the chat log for a batched insert (workflow_id may be None)
         try:
             # Convert result to JSON string safely
             answer_str = (
-                result if isinstance(result, str) else json.dumps(result, default=str, ensure_ascii=False)
+                result if isinstance(result, str) else orjson.dumps(result, default=str).decode()
             )
-            chat = ChatLog(
-                workflow_id=req.workflow_id,
-                question=req.user_query,
-                answer=answer_str,
-            )
-            db.add(chat)
-            db.commit()
-            db.refresh(chat)
+            log_chat(req.workflow_id, req.user_query, answer_str)
         except Exception:
             # Do not fail the whole request if DB saving fails; log in your real app.
             pass
@@ -111,21 +107,36 @@ def save_workflow(req: SaveWorkflowRequest, db: Session = Depends(get_db)):
 
 
 @router.get("/list")
-def list_workflows(db: Session = Depends(get_db)):
+def list_workflows(
+    include: Optional[str] = Query(None, description="Pass 'definition' to include workflow definitions"),
+    db: Session = Depends(get_db),
+):
     """
     List all saved workflows.
+
+    Definitions are only loaded when requested with ?include=definition;
+    use GET /workflow/{workflow_id} to fetch a single definition.
     """
-    workflows = db.query(WorkflowModel).all()
-    return {
-        "workflows": [
-            {
-                "id": wf.id,
-                "name": wf.name,
-                "definition": wf.definition,
-                "created_at": wf.created_at
-            } for wf in workflows
-        ]
-    }
+    include_definition = include == "definition"
+
+    # This listing never reads chat_logs; fail loudly if that ever changes
+    options = [raiseload(WorkflowModel.chat_logs)]
+    if not include_definition:
+        options.append(defer(WorkflowModel.definition, raiseload=True))
+    workflows = db.query(WorkflowModel).options(*options).all()
+
+    items = []
+    for wf in workflows:
+        item = {
+            "id": wf.id,
+            "name": wf.name,
+            "created_at": wf.created_at,
+            "updated_at": wf.updated_at,
+        }
+        if include_definition:
+            item["definition"] = wf.definition
+        items.append(item)
+    return {"workflows": items}
 
 
 @router.get("/{workflow_id}")
@@ -133,7 +144,12 @@ def get_workflow(workflow_id: int, db: Session = Depends(get_db)):
     """
     Get a specific workflow by ID.
     """
-    workflow = db.query(WorkflowModel).filter(WorkflowModel.id == workflow_id).first()
+    workflow = (
+        db.query(WorkflowModel)
+        .options(raiseload("*"))
+        .filter(WorkflowModel.id == workflow_id)
+        .first()
+    )
     if not workflow:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Workflow not found")
 
@@ -0,0 +1,95 @@
+# app/services/chat_log_writer.py
+
+import asyncio
+import logging
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import insert
+
+from app.database import SessionLocal
+from app.models import ChatLog
+
+logger = logging.getLogger(__name__)
+
+# Flush when this many logs are queued, or when the oldest has waited this long
+MAX_BATCH_SIZE = 50
+MAX_BATCH_DELAY = 1.0  # seconds
+
+_queue: Optional[asyncio.Queue] = None
+_task: Optional[asyncio.Task] = None
+
+def _insert_rows(rows: List[Dict[str, Any]]) -> None:
+    """Write a batch of chat logs with a single multi-row INSERT."""
+    db = SessionLocal()
+    try:
+        db.execute(insert(ChatLog), rows)
+        db.commit()
+    finally:
+        db.close()
+
+async def _flush(rows: List[Dict[str, Any]]) -> None:
+    try:
+        await asyncio.to_thread(_insert_rows, rows)
+    except Exception as e:
+        # Chat logs are best-effort; never let a failed write kill the writer
+        logger.error(f"Error writing {len(rows)} chat logs: {e}")
+
+async def _run() -> None:
+    loop = asyncio.get_running_loop()
+    while True:
+        rows = [await _queue.get()]
+        deadline = loop.time() + MAX_BATCH_DELAY
+        try:
+            while len(rows) < MAX_BATCH_SIZE:
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    break
+                try:
+                    rows.append(await asyncio.wait_for(_queue.get(), remaining))
+                except asyncio.TimeoutError:
+                    break
+        except asyncio.CancelledError:
+            # Shutting down mid-batch: write what we already took off the queue
+            await _flush(rows)
+            raise
+        await _flush(rows)
+
+def start() -> None:
+    """Start the background writer task (idempotent)."""
+    global _queue, _task
+
+    if _task is not None and not _task.done():
+        return
+    if _queue is None:
+        _queue = asyncio.Queue()
+    _task = asyncio.get_running_loop().create_task(_run())
+
+async def stop() -> None:
+    """Stop the writer and flush any logs still queued."""
+    global _task
+
+    if _task is not None:
+        _task.cancel()
+        try:
+            await _task
+        except asyncio.CancelledError:
+            pass
+        _task = None
+
+    if _queue is not None:
+        rows = []
+        while not _queue.empty():
+            rows.append(_queue.get_nowait())
+        if rows:
+            await _flush(rows)
+
+def log_chat(workflow_id: Optional[int], question: str, answer: str) -> None:
+    """Queue a chat log for the next batched insert."""
+    start()
+    _queue.put_nowait({
+        "workflow_id": workflow_id,
+        "question": question,
+        "answer": answer,
+        "created_at": datetime.utcnow(),
+    })
@@ -0,0 +1,79 @@
+# app/services/chunker.py
+
+from typing import Iterable, Iterator, List
+
+CHUNK_SIZE = 500
+CHUNK_OVERLAP = 100
+
+# Preferred cut points, strongest boundary first
+_SEPARATORS = ("\n\n", "\n", ". ", " ")
+
+def chunk_text(text: str, size: int = CHUNK_SIZE, overlap: int = CHUNK_OVERLAP) -> List[str]:
+    """
+    Split text into overlapping chunks, cutting on paragraph/line/sentence/word boundaries.
+
+    Boundaries are looked up with str.rfind over the back half of each window,
+    which scans in C and avoids building per-window substrings or regex matches.
+
+    Args:
+        text: Text to split
+        size: Maximum chunk length in characters
+        overlap: Characters carried over from the end of one chunk into the next
+
+    Returns:
+        List of non-empty chunks, in order
+    """
+    chunks = []
+    n = len(text)
+    start = 0
+    while start < n:
+        end = _chunk_end(text, start, size)
+        chunk = text[start:end].strip()
+        if chunk:
+            chunks.append(chunk)
+        if end >= n:
+            break
+        start = max(end - overlap, start + 1)
+    return chunks
+
+def iter_chunks(pieces: Iterable[str], size: int = CHUNK_SIZE, overlap: int = CHUNK_OVERLAP) -> Iterator[str]:
+    """
+    Chunk text that arrives in pieces (e.g. PDF pages), without joining it first.
+
+    Yields exactly the chunks chunk_text("".join(pieces)) would return; only
+    the not yet chunked tail is kept between pieces.
+
+    Args:
+        pieces: Consecutive pieces of the text
+        size: Maximum chunk length in characters
+        overlap: Characters carried over from the end of one chunk into the next
+
+    Yields:
+        Non-empty chunks, in order
+    """
+    tail = ""
+    for piece in pieces:
+        tail += piece
+        start = 0
+        # A chunk is final once a full window fits before the end of what we have
+        while start + size < len(tail):
+            end = _chunk_end(tail, start, size)
+            chunk = tail[start:end].strip()
+            if chunk:
+                yield chunk
+            start = max(end - overlap, start + 1)
+        tail = tail[start:]
+    yield from chunk_text(tail, size, overlap)
+
+def _chunk_end(text: str, start: int, size: int) -> int:
+    """End of the chunk starting at start: the strongest boundary in the back half of its window."""
+    end = start + size
+    if end >= len(text):
+        return len(text)
+    # Only accept a boundary in the back half so chunks don't shrink too much
+    half = size // 2
+    for sep in _SEPARATORS:
+        cut = text.rfind(sep, start + half, end)
+        if cut != -1:
+            return cut + len(sep)
+    return end
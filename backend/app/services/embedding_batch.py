@@ -0,0 +1,94 @@
+# app/services/embedding_batch.py
+
+import os
+import asyncio
+import logging
+from typing import List, Optional, Tuple
+
+from app.database import SessionLocal
+from app.models import Document
+from .llm_service import retrieve_embedding_batch, submit_embedding_batch
+from .vector_store import add_chunks
+
+logger = logging.getLogger(__name__)
+
+# Documents with more chunks than this are embedded through the Batch API
+BATCH_CHUNK_THRESHOLD = int(os.getenv("EMBEDDING_BATCH_THRESHOLD", "100"))
+# How often pending batches are checked
+POLL_INTERVAL = int(os.getenv("EMBEDDING_BATCH_POLL_SECONDS", "300"))
+
+_task: Optional[asyncio.Task] = None
+
+async def submit_document_batch(doc_id: str, chunks: List[str]) -> str:
+    """Queue a document's chunks for batch embedding; returns the batch id to store on the document."""
+    return await submit_embedding_batch({f"{doc_id}:{i}": chunk for i, chunk in enumerate(chunks)})
+
+def _pending_batches() -> List[Tuple[str, str]]:
+    db = SessionLocal()
+    try:
+        rows = db.query(Document.doc_id, Document.batch_id).filter(Document.batch_id.isnot(None)).all()
+        return [(row.doc_id, row.batch_id) for row in rows]
+    finally:
+        db.close()
+
+def _clear_batch_id(doc_id: str) -> None:
+    db = SessionLocal()
+    try:
+        db.query(Document).filter(Document.doc_id == doc_id).update({Document.batch_id: None})
+        db.commit()
+    finally:
+        db.close()
+
+async def _reconcile_document(doc_id: str, batch_id: str) -> None:
+    status, inputs, embeddings = await retrieve_embedding_batch(batch_id)
+    if not inputs:
+        # Still validating / in progress
+        return
+
+    order = sorted(inputs, key=lambda custom_id: int(custom_id.rsplit(":", 1)[1]))
+    chunks = [inputs[custom_id] for custom_id in order]
+    vectors = [embeddings[custom_id] for custom_id in order] if len(embeddings) == len(order) else None
+    if vectors is None:
+        logger.warning(
+            f"Embedding batch {batch_id} for document {doc_id} ended '{status}' with "
+            f"{len(order) - len(embeddings)} missing embeddings; embedding in real time"
+        )
+
+    await add_chunks(doc_id, chunks, vectors)
+    await asyncio.to_thread(_clear_batch_id, doc_id)
+    logger.info(f"Reconciled embedding batch {batch_id} for document {doc_id}")
+
+async def reconcile_pending_batches() -> None:
+    """Index every document whose embedding batch has finished."""
+    for doc_id, batch_id in await asyncio.to_thread(_pending_batches):
+        try:
+            await _reconcile_document(doc_id, batch_id)
+        except Exception as e:
+            logger.error(f"Error reconciling embedding batch {batch_id} for document {doc_id}: {e}")
+
+async def _run() -> None:
+    while True:
+        try:
+            await reconcile_pending_batches()
+        except Exception as e:
+            logger.error(f"Error checking pending embedding batches: {e}")
+        await asyncio.sleep(POLL_INTERVAL)
+
+def start() -> None:
+    """Start the background reconciler task (idempotent)."""
+    global _task
+
+    if _task is None or _task.done():
+        _task = asyncio.get_running_loop().create_task(_run())
+
+async def stop() -> None:
+    """Stop the background reconciler task."""
+    global _task
+
+    if _task is not None:
+        _task.cancel()
+        try:
+            await _task
+        except asyncio.CancelledError:
+            pass
+        _task = None
@@ -0,0 +1,139 @@
+# app/services/llm_cache.py
+
+import os
+import asyncio
+import hashlib
+import logging
+from typing import Any, Dict, List, Optional, Sequence, Set
+
+import numpy as np
+import orjson
+from cachetools import LRUCache
+
+from .vector_store import embed_query
+
+logger = logging.getLogger(__name__)
+
+LLM_CACHE_SIZE = int(os.getenv("LLM_CACHE_SIZE", "1024"))
+# Minimum cosine similarity between two queries for a semantic hit
+LLM_CACHE_SIMILARITY = float(os.getenv("LLM_CACHE_SIMILARITY", "0.97"))
+# Past queries kept per partition for the semantic lookup
+SEMANTIC_PARTITION_SIZE = 256
+
+class _Partition:
+    """Unit-normalised query embeddings and their answers, oldest first."""
+
+    def __init__(self, dim: int):
+        self.vectors = np.empty((0, dim), dtype=np.float32)
+        self.answers: List[str] = []
+
+    def nearest(self, vector: np.ndarray) -> tuple[float, Optional[str]]:
+        if not self.answers:
+            return 0.0, None
+        scores = self.vectors @ vector
+        best = int(scores.argmax())
+        return float(scores[best]), self.answers[best]
+
+    def add(self, vector: np.ndarray, answer: str) -> None:
+        self.vectors = np.vstack([self.vectors, vector])[-SEMANTIC_PARTITION_SIZE:]
+        self.answers = (self.answers + [answer])[-SEMANTIC_PARTITION_SIZE:]
+
+# Exact tier: full request digest -> answer
+_exact: LRUCache = LRUCache(maxsize=LLM_CACHE_SIZE)
+# Semantic tier: digest of everything except the user message -> past queries
+_semantic: LRUCache = LRUCache(maxsize=LLM_CACHE_SIZE)
+# Background semantic inserts, referenced until done so they aren't garbage collected
+_pending: Set[asyncio.Task] = set()
+
+def _digest(obj: Any) -> str:
+    return hashlib.blake2b(orjson.dumps(obj, option=orjson.OPT_SORT_KEYS)).hexdigest()
+
+def _keys(messages: List[Dict[str, str]], context_ids: Sequence[Any], params: Dict[str, Any]) -> tuple[str, str]:
+    """
+    Build the exact and semantic cache keys for a chat request.
+
+    Both include the retrieved context ids, so similar questions answered from
+    different documents never share an answer.
+    """
+    context_ids = sorted(str(i) for i in context_ids)
+    system = [m["content"] for m in messages if m["role"] == "system"]
+    exact_key = _digest({"params": params, "messages": messages, "context_ids": context_ids})
+    partition_key = _digest({"params": params, "system": system, "context_ids": context_ids})
+    return exact_key, partition_key
+
+async def _query_vector(query: str) -> Optional[np.ndarray]:
+    try:
+        embedding = await embed_query(query)
+    except RuntimeError:
+        return None
+    vector = np.asarray(embedding, dtype=np.float32)
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm else None
+
+async def get(
+    query: str,
+    messages: List[Dict[str, str]],
+    context_ids: Sequence[Any],
+    params: Dict[str, Any],
+) -> Optional[str]:
+    """
+    Look up a cached answer for a chat request.
+
+    Args:
+        query: The user's question, used for the semantic lookup
+        messages: Chat messages that would be sent to the model
+        context_ids: Ids of the retrieved documents the prompt was built from
+        params: Model parameters (model, temperature, max_tokens)
+
+    Returns:
+        The cached answer, or None on a miss
+    """
+    exact_key, partition_key = _keys(messages, context_ids, params)
+    answer = _exact.get(exact_key)
+    if answer is not None:
+        return answer
+
+    partition = _semantic.get(partition_key)
+    if partition is None:
+        return None
+    vector = await _query_vector(query)
+    if vector is None:
+        return None
+    score, answer = partition.nearest(vector)
+    if answer is not None and score >= LLM_CACHE_SIMILARITY:
+        logger.info(f"Semantic LLM cache hit (similarity {score:.3f})")
+        return answer
+    return None
+
+def put(
+    query: str,
+    messages: List[Dict[str, str]],
+    context_ids: Sequence[Any],
+    params: Dict[str, Any],
+    answer: str,
+) -> None:
+    """
+    Store a model answer in both cache tiers.
+
+    The semantic tier needs the query embedding, which may cost an API call,
+    so it is filled in a background task and the answer is not held up.
+    """
+    exact_key, partition_key = _keys(messages, context_ids, params)
+    _exact[exact_key] = answer
+
+    task = asyncio.create_task(_put_semantic(query, partition_key, answer))
+    _pending.add(task)
+    task.add_done_callback(_pending.discard)
+
+async def _put_semantic(query: str, partition_key: str, answer: str) -> None:
+    try:
+        vector = await _query_vector(query)
+    except Exception as e:
+        logger.warning(f"Skipping semantic LLM cache insert: {e}")
+        return
+    if vector is None:
+        return
+    partition = _semantic.get(partition_key)
+    if partition is None or partition.vectors.shape[1] != vector.shape[0]:
+        partition = _semantic[partition_key] = _Partition(vector.shape[0])
+    partition.add(vector, answer)
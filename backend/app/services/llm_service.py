@@ -2,21 +2,66 @@
 
 from dotenv import load_dotenv
 import os
-from openai import OpenAI
+import json
+import asyncio
+from typing import AsyncIterator
+import openai
+from tenacity import retry, retry_if_exception_type, stop_after_attempt, wait_random_exponential
 import logging
 
+from . import openai_client
+
 # Load environment variables from .env
 load_dotenv()
 
-OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
 OPENAI_MODEL = os.getenv("OPENAI_MODEL", "gpt-3.5-turbo")
+OPENAI_EMBEDDING_MODEL = os.getenv("OPENAI_EMBEDDING_MODEL", "text-embedding-3-small")
+# Upper bound on OpenAI requests in flight, to stay under the account's rate limits
+OPENAI_CONCURRENCY_LIMIT = int(os.getenv("OPENAI_CONCURRENCY_LIMIT", "16"))
 
 logger = logging.getLogger(__name__)
 
-# Initialize OpenAI client
-_client = OpenAI(api_key=OPENAI_API_KEY) if OPENAI_API_KEY else None
+# Shared OpenAI client (retries are handled by _retry_transient below)
+_client = openai_client.client
+
+_openai_semaphore = asyncio.Semaphore(OPENAI_CONCURRENCY_LIMIT)
+
+# Static instructions go in their own system message so every call shares a
+# stable prefix that OpenAI's prompt caching can reuse
+SYSTEM_MSG = "Use the following context to answer the question. Be concise."
+
+# Retry rate limits, timeouts, connection drops and 5xx up to 3 attempts with jittered backoff
+_retry_transient = retry(
+    stop=stop_after_attempt(3),
+    wait=wait_random_exponential(min=1, max=20),
+    retry=retry_if_exception_type((
+        openai.RateLimitError,
+        openai.APIConnectionError,
+        openai.APITimeoutError,
+        openai.InternalServerError,
+    )),
+    reraise=True,
+)
+
+@_retry_transient
+async def create_chat_completion(**kwargs):
+    """Call the chat completions API with retries and the shared concurrency limit."""
+    async with _openai_semaphore:
+        return await _client.chat.completions.create(**kwargs)
+
+async def stream_chat_completion(**kwargs) -> AsyncIterator[str]:
+    """Stream a chat completion, yielding content deltas as they arrive."""
+    stream = await create_chat_completion(stream=True, **kwargs)
+    async for chunk in stream:
+        if chunk.choices and chunk.choices[0].delta.content:
+            yield chunk.choices[0].delta.content
 
-def ask_llm(query: str, context: str | None = None, max_tokens: int = 500, temperature: float = 0.0) -> str:
+@_retry_transient
+async def _create_embeddings(**kwargs):
+    async with _openai_semaphore:
+        return await _client.embeddings.create(**kwargs)
+
+async def ask_llm(query: str, context: str | None = None, max_tokens: int = 500, temperature: float = 0.0) -> str:
     """
     Sends a query (with optional context) to OpenAI GPT and returns the response.
     Falls back to a dummy response if the API key is not set.
@@ -33,18 +78,21 @@ def ask_llm(query: str, context: str | None = None, max_tokens: int = 500, tempe
     if not query.strip():
         return "Please provide a valid query."
     
-    prompt = query
+    messages = [{"role": "user", "content": query}]
     if context and context.strip():
-        prompt = f"Use the following context to answer the question:\n\n{context}\n\nQuestion: {query}"
+        messages = [
+            {"role": "system", "content": SYSTEM_MSG},
+            {"role": "user", "content": f"Context:\n{context}\n\nQuestion: {query}"},
+        ]
 
     if _client is None:
         logger.warning("OpenAI client not initialized - using fallback response")
         return f"(Fallback) Query: {query}"
 
     try:
-        response = _client.chat.completions.create(
+        response = await create_chat_completion(
             model=OPENAI_MODEL,
-            messages=[{"role": "user", "content": prompt}],
+            messages=messages,
             max_tokens=max_tokens,
             temperature=temperature,
         )
@@ -57,31 +105,122 @@ def ask_llm(query: str, context: str | None = None, max_tokens: int = 500, tempe
         logger.error(f"Error calling OpenAI API: {exc}")
         return f"(LLM error: {exc})"
 
-def get_embedding(text: str, model: str = "text-embedding-3-small") -> list[float] | None:
+async def get_embeddings(texts: list[str], model: str = OPENAI_EMBEDDING_MODEL) -> list[list[float]] | None:
     """
-    Get embedding for a text using OpenAI's embedding API.
+    Get embeddings for a batch of texts in a single OpenAI API call.
     
     Args:
-        text: Text to embed
+        texts: Texts to embed
         model: Embedding model to use
     
     Returns:
-        List of floats representing the embedding, or None if error
+        List of embeddings in the same order as texts, or None if error
     """
     if not _client:
         logger.warning("OpenAI client not initialized - cannot generate embedding")
         return None
     
+    if not texts:
+        return []
+    
     try:
-        response = _client.embeddings.create(
-            input=text,
+        response = await _create_embeddings(
+            input=texts,
             model=model
         )
-        return response.data[0].embedding
+        return [d.embedding for d in response.data]
     except Exception as exc:
-        logger.error(f"Error generating embedding: {exc}")
+        logger.error(f"Error generating embeddings: {exc}")
         return None
 
+async def get_embedding(text: str, model: str = OPENAI_EMBEDDING_MODEL) -> list[float] | None:
+    """
+    Get embedding for a text using OpenAI's embedding API.
+    
+    Args:
+        text: Text to embed
+        model: Embedding model to use
+    
+    Returns:
+        List of floats representing the embedding, or None if error
+    """
+    embeddings = await get_embeddings([text], model=model)
+    return embeddings[0] if embeddings else None
+
+async def submit_embedding_batch(inputs: dict[str, str], model: str = OPENAI_EMBEDDING_MODEL) -> str:
+    """
+    Submit texts to the OpenAI Batch API for asynchronous embedding.
+    
+    Args:
+        inputs: Texts to embed, keyed by a caller-chosen custom_id
+        model: Embedding model to use
+    
+    Returns:
+        The id of the created batch
+    """
+    if not _client:
+        raise RuntimeError("OpenAI client not initialized - cannot submit embedding batch")
+    
+    lines = [
+        json.dumps({
+            "custom_id": custom_id,
+            "method": "POST",
+            "url": "/v1/embeddings",
+            "body": {"model": model, "input": text},
+        })
+        for custom_id, text in inputs.items()
+    ]
+    batch_file = await _client.files.create(
+        file=("embeddings.jsonl", "\n".join(lines).encode("utf-8")),
+        purpose="batch",
+    )
+    batch = await _client.batches.create(
+        input_file_id=batch_file.id,
+        endpoint="/v1/embeddings",
+        completion_window="24h",
+    )
+    logger.info(f"Submitted embedding batch {batch.id} with {len(lines)} inputs")
+    return batch.id
+
+async def retrieve_embedding_batch(batch_id: str) -> tuple[str, dict[str, str], dict[str, list[float]]]:
+    """
+    Check an embedding batch and download its results once it has finished.
+    
+    Args:
+        batch_id: Id returned by submit_embedding_batch
+    
+    Returns:
+        Tuple of (status, inputs, embeddings). inputs and embeddings are keyed by
+        custom_id and stay empty until the batch reaches a terminal status;
+        embeddings omits any request that failed inside the batch.
+    """
+    if not _client:
+        raise RuntimeError("OpenAI client not initialized - cannot retrieve embedding batch")
+    
+    batch = await _client.batches.retrieve(batch_id)
+    if batch.status not in ("completed", "failed", "expired", "cancelled"):
+        return batch.status, {}, {}
+    
+    inputs = {}
+    input_file = await _client.files.content(batch.input_file_id)
+    for line in input_file.text.splitlines():
+        if line.strip():
+            item = json.loads(line)
+            inputs[item["custom_id"]] = item["body"]["input"]
+    
+    embeddings = {}
+    if batch.output_file_id:
+        output_file = await _client.files.content(batch.output_file_id)
+        for line in output_file.text.splitlines():
+            if not line.strip():
+                continue
+            item = json.loads(line)
+            response = item.get("response") or {}
+            if response.get("status_code") == 200:
+                embeddings[item["custom_id"]] = response["body"]["data"][0]["embedding"]
+    
+    return batch.status, inputs, embeddings
+
 def is_llm_available() -> bool:
     """Check if LLM service is available."""
     return _client is not None
\ No newline at end of file
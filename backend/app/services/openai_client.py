@@ -0,0 +1,25 @@
+# app/services/openai_client.py
+
+import os
+
+import httpx
+from dotenv import load_dotenv
+from openai import AsyncOpenAI
+
+# Load environment variables from .env
+load_dotenv()
+
+OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
+OPENAI_MAX_CONNECTIONS = int(os.getenv("OPENAI_MAX_CONNECTIONS", "100"))
+
+# Single app-wide client: chat and embedding requests share one HTTP/2
+# connection pool. Retries are handled in llm_service, so the SDK's are off.
+client = AsyncOpenAI(
+    api_key=OPENAI_API_KEY,
+    max_retries=0,
+    http_client=httpx.AsyncClient(
+        http2=True,
+        limits=httpx.Limits(max_connections=OPENAI_MAX_CONNECTIONS, max_keepalive_connections=50),
+        timeout=30,
+    ),
+) if OPENAI_API_KEY else None
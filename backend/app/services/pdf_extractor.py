@@ -2,26 +2,126 @@
 
 import os
 import logging
-from typing import Optional
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from itertools import repeat
+from typing import Iterator, Optional
 
 import fitz  # PyMuPDF
 
 logger = logging.getLogger(__name__)
 
-def extract_text_from_pdf(file_path: str, max_pages: Optional[int] = None) -> str:
-    """Extract text from a PDF file."""
+# PDFs with more pages than this are split across worker processes
+PARALLEL_PAGE_THRESHOLD = int(os.getenv("PDF_PARALLEL_PAGE_THRESHOLD", "8"))
+
+_process_pool: Optional[ProcessPoolExecutor] = None
+_process_pool_lock = threading.Lock()
+
+def _get_process_pool() -> ProcessPoolExecutor:
+    """Create the shared extraction pool on first use."""
+    global _process_pool
+    
+    with _process_pool_lock:
+        if _process_pool is None:
+            # forkserver: workers never inherit the server's threads, locks or sockets
+            _process_pool = ProcessPoolExecutor(
+                max_workers=os.cpu_count(),
+                mp_context=multiprocessing.get_context("forkserver"),
+            )
+        return _process_pool
+
+def _discard_process_pool(pool: ProcessPoolExecutor) -> None:
+    """Drop a broken pool so the next large PDF gets a fresh one."""
+    global _process_pool
+    
+    with _process_pool_lock:
+        if _process_pool is pool:
+            _process_pool = None
+    pool.shutdown(wait=False, cancel_futures=True)
+
+def shutdown_process_pool() -> None:
+    """Stop the extraction workers, if any were started."""
+    global _process_pool
+    
+    with _process_pool_lock:
+        pool, _process_pool = _process_pool, None
+    if pool is not None:
+        pool.shutdown(wait=True, cancel_futures=True)
+
+def _extract_range(file_path: str, lo: int, hi: int) -> str:
+    """Extract text from pages [lo, hi) using its own document handle."""
+    with fitz.open(file_path) as doc:
+        return "".join(doc[i].get_text() for i in range(lo, hi))
+
+def iter_pdf_pages(file_path: str, max_pages: Optional[int] = None) -> Iterator[str]:
+    """
+    Yield the text of each page of a PDF, one page at a time.
+    
+    Args:
+        file_path: Path to the PDF file
+        max_pages: Optional limit on the number of pages to read
+    
+    Yields:
+        Text of each page, in order
+    """
+    if not os.path.exists(file_path):
+        raise FileNotFoundError(f"PDF file not found: {file_path}")
+    
+    with fitz.open(file_path) as doc:
+        for i in range(min(len(doc), max_pages or len(doc))):
+            yield doc[i].get_text()
+
+def iter_pdf_text(file_path: str) -> Iterator[str]:
+    """
+    Yield the text of a PDF in page order, sharding large documents across processes.
+    
+    Small documents are read one page at a time; large ones arrive as one
+    piece per worker's page range.
+    
+    Args:
+        file_path: Path to the PDF file
+    
+    Yields:
+        Consecutive pieces of the document text
+    """
     if not os.path.exists(file_path):
         raise FileNotFoundError(f"PDF file not found: {file_path}")
     
+    workers = os.cpu_count() or 1
+    with fitz.open(file_path) as doc:
+        page_count = len(doc)
+    
+    if workers < 2 or page_count <= PARALLEL_PAGE_THRESHOLD:
+        yield from iter_pdf_pages(file_path)
+        return
+    
+    step = -(-page_count // workers)
+    bounds = range(0, page_count, step)
+    his = [min(lo + step, page_count) for lo in bounds]
+    pool = _get_process_pool()
+    done = 0
     try:
-        with fitz.open(file_path) as doc:
-            pages = range(min(len(doc), max_pages or len(doc)))
-            text = ""
-            
-            for i in pages:
-                text += doc[i].get_text()
-            
-            return text
+        for hi, part in zip(his, pool.map(_extract_range, repeat(file_path), bounds, his)):
+            yield part
+            done = hi
+        return
+    except BrokenProcessPool:
+        # A worker died (OOM kill, crash in MuPDF); read the rest serially instead
+        logger.warning(f"PDF extraction pool broke on {file_path}, falling back to serial extraction")
+        _discard_process_pool(pool)
+    
+    with fitz.open(file_path) as doc:
+        for i in range(done, page_count):
+            yield doc[i].get_text()
+
+def extract_text_from_pdf(file_path: str, max_pages: Optional[int] = None) -> str:
+    """Extract text from a PDF file, sharding large documents across processes."""
+    try:
+        if max_pages is None:
+            return "".join(iter_pdf_text(file_path))
+        return "".join(iter_pdf_pages(file_path, max_pages))
             
     except Exception as e:
         logger.error(f"Error extracting text from PDF: {e}")
@@ -41,14 +141,13 @@ def get_pdf_metadata(file_path: str) -> dict:
         raise FileNotFoundError(f"PDF file not found: {file_path}")
     
     try:
-        doc = fitz.open(file_path)
-        metadata = doc.metadata
-        
-        # Add additional info
-        metadata["page_count"] = len(doc)
-        metadata["file_size"] = os.path.getsize(file_path)
+        with fitz.open(file_path) as doc:
+            metadata = doc.metadata
+            
+            # Add additional info
+            metadata["page_count"] = len(doc)
+            metadata["file_size"] = os.path.getsize(file_path)
         
-        doc.close()
         return metadata
         
     except Exception as e:
@@ -69,19 +168,8 @@ def extract_text_by_page(file_path: str) -> list[str]:
         raise FileNotFoundError(f"PDF file not found: {file_path}")
     
     try:
-        doc = fitz.open(file_path)
-        pages = []
-        
-        for page_num in range(len(doc)):
-            page = doc[page_num]
-            page_text = page.get_text("text").strip()
-            pages.append(page_text)
-        
-        doc.close()
-        return pages
+        return [page_text.strip() for page_text in iter_pdf_pages(file_path)]
         
     except Exception as e:
         logger.error(f"Error extracting text by page from PDF {file_path}: {e}")
-        raise Exception(f"Failed to extract text by page from PDF: {str(e)}")
-
-print("All dependencies installed successfully!")
\ No newline at end of file
+        raise Exception(f"Failed to extract text by page from PDF: {str(e)}")
\ No newline at end of file
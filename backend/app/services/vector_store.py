@@ -1,16 +1,34 @@
 # app/services/vector_store.py
 
 import os
+import asyncio
 import logging
-from typing import List, Dict, Any
+import threading
+from typing import List, Dict, Any, Tuple
 
 import chromadb
+from async_lru import alru_cache
 from chromadb.config import Settings
 
+from .chunker import chunk_text
+from .llm_service import OPENAI_EMBEDDING_MODEL, get_embedding, get_embeddings
+
 logger = logging.getLogger(__name__)
 
+# Chunks per embeddings request, and how many of those requests may be in flight
+EMBEDDING_BATCH_SIZE = 100
+EMBEDDING_CONCURRENCY = 10
+_embedding_semaphore = asyncio.Semaphore(EMBEDDING_CONCURRENCY)
+
+QUERY_EMBEDDING_CACHE_SIZE = int(os.getenv("QUERY_EMBEDDING_CACHE_SIZE", "1024"))
+
+# One collection per embedding model: Chroma fixes a collection's dimension at
+# the first add, so vectors from different models must never share one
+COLLECTION_NAME = f"documents-{OPENAI_EMBEDDING_MODEL}"
+
 _client = None
 _collection = None
+_collection_lock = threading.Lock()
 
 def _get_chroma_collection():
     """Initialize and return ChromaDB collection."""
@@ -19,83 +37,170 @@ def _get_chroma_collection():
     if _collection is not None:
         return _collection
 
-    try:
-        base_dir = os.path.dirname(os.path.dirname(os.path.dirname(__file__)))
-        persist_dir = os.path.join(base_dir, "chroma_db")
-        os.makedirs(persist_dir, exist_ok=True)
-
-        _client = chromadb.PersistentClient(
-            path=persist_dir,
-            settings=Settings(
-                anonymized_telemetry=False,
-                allow_reset=True,
-                is_persistent=True
+    with _collection_lock:
+        # Another request may have initialized it while we waited
+        if _collection is not None:
+            return _collection
+
+        try:
+            base_dir = os.path.dirname(os.path.dirname(os.path.dirname(__file__)))
+            persist_dir = os.path.join(base_dir, "chroma_db")
+            os.makedirs(persist_dir, exist_ok=True)
+
+            _client = chromadb.PersistentClient(
+                path=persist_dir,
+                settings=Settings(
+                    anonymized_telemetry=False,
+                    allow_reset=True,
+                    is_persistent=True
+                )
             )
-        )
         
-        _collection = _client.get_or_create_collection(name="documents")
-        return _collection
+            _collection = _client.get_or_create_collection(
+                name=COLLECTION_NAME,
+                metadata={"embedding_model": OPENAI_EMBEDDING_MODEL}
+            )
+            return _collection
         
-    except Exception as e:
-        logger.error(f"Error initializing ChromaDB: {e}")
-        raise
+        except Exception as e:
+            logger.error(f"Error initializing ChromaDB: {e}")
+            raise
+
+def init_vector_store() -> None:
+    """Open the Chroma client and collection ahead of the first request."""
+    _get_chroma_collection()
+
+async def _embed_batch(batch: List[str]) -> List[List[float]] | None:
+    async with _embedding_semaphore:
+        return await get_embeddings(batch)
+
+async def _embed_chunks(chunks: List[str]) -> List[List[float]] | None:
+    """Embed chunks in concurrent batches; returns None if any batch could not be embedded."""
+    batches = [chunks[i:i + EMBEDDING_BATCH_SIZE] for i in range(0, len(chunks), EMBEDDING_BATCH_SIZE)]
+    results = await asyncio.gather(*(_embed_batch(b) for b in batches))
+    if any(r is None for r in results):
+        return None
+    return [embedding for r in results for embedding in r]
+
+@alru_cache(maxsize=QUERY_EMBEDDING_CACHE_SIZE)
+async def embed_query(query: str, model: str = OPENAI_EMBEDDING_MODEL) -> tuple[float, ...]:
+    """Embed a query once per (query, model); failures raise so they are never cached."""
+    embedding = await get_embedding(query, model=model)
+    if embedding is None:
+        raise RuntimeError("Query embedding unavailable")
+    return tuple(embedding)
+
+async def _query_args(queries: List[str]) -> Dict[str, Any]:
+    """
+    Embed the queries with the same model as the documents.
+
+    Raises RuntimeError if they can't be embedded; falling back to Chroma's own
+    embedding function would search a different vector space.
+    """
+    embeddings = await asyncio.gather(*(embed_query(q) for q in queries))
+    return {"query_embeddings": [list(e) for e in embeddings]}
+
+async def batched_search(queries: List[Tuple[str, int]]) -> List[List[Dict[str, Any]]]:
+    """
+    Search for several (query, k) pairs with a single vector store call.
+
+    Chroma takes one n_results per call, so every query asks for the largest k
+    and each result list is trimmed to its own k.
+
+    Args:
+        queries: (query, k) pairs
+
+    Returns:
+        One list of matching documents per query, in the same order
+    """
+    if not queries:
+        return []
 
-async def search_documents(query: str, k: int = 3) -> List[Dict[str, Any]]:
-    """Search for relevant documents using the query."""
     try:
         collection = _get_chroma_collection()
-        results = collection.query(
-            query_texts=[query],
-            n_results=k
+        results = await asyncio.to_thread(
+            collection.query,
+            **await _query_args([query for query, _ in queries]),
+            n_results=max(k for _, k in queries)
         )
-        
-        documents = []
-        for i in range(len(results['ids'][0])):
-            documents.append({
-                "id": results['ids'][0][i],
-                "text": results['documents'][0][i],
-                "metadata": results['metadatas'][0][i] if results['metadatas'] else {},
-                "distance": results['distances'][0][i] if results['distances'] else None
-            })
-            
-        return documents
+
+        batched = []
+        for q, (_, k) in enumerate(queries):
+            documents = []
+            for i in range(min(k, len(results['ids'][q]))):
+                documents.append({
+                    "id": results['ids'][q][i],
+                    "text": results['documents'][q][i],
+                    "metadata": results['metadatas'][q][i] if results['metadatas'] else {},
+                    "distance": results['distances'][q][i] if results['distances'] else None
+                })
+            batched.append(documents)
+
+        return batched
     except Exception as e:
         logger.error(f"Error searching documents: {e}")
         raise
 
-async def add_document(doc_id: str, text: str, metadata: Dict[str, Any] = None) -> None:
-    """Add a document to the vector store."""
+async def search_documents(query: str, k: int = 3) -> List[Dict[str, Any]]:
+    """Search for relevant documents using the query."""
+    return (await batched_search([(query, k)]))[0]
+
+async def add_chunks(
+    doc_id: str,
+    chunks: List[str],
+    embeddings: List[List[float]] | None = None,
+    metadata: Dict[str, Any] = None,
+) -> None:
+    """Add pre-split chunks to the vector store, embedding them in concurrent batches if needed."""
     try:
         collection = _get_chroma_collection()
         
-        # Split text into chunks if it's too long (optional)
-        # For now, we'll add it as a single document
+        if embeddings is None:
+            embeddings = await _embed_chunks(chunks)
+            if embeddings is None:
+                # Never let Chroma embed with its own (differently sized) model
+                raise RuntimeError("Embedding service unavailable")
         
-        collection.add(
-            documents=[text],
-            ids=[doc_id],
-            metadatas=[metadata or {}]
+        # Chroma writes (SQLite + HNSW index) block, so keep them off the event loop
+        await asyncio.to_thread(
+            collection.add,
+            documents=chunks,
+            embeddings=embeddings,
+            ids=[f"{doc_id}:{i}" for i in range(len(chunks))],
+            metadatas=[{**(metadata or {}), "doc_id": doc_id, "chunk_index": i} for i in range(len(chunks))]
         )
         
-        logger.info(f"Successfully added document {doc_id} to vector store")
+        logger.info(f"Successfully added document {doc_id} to vector store ({len(chunks)} chunks)")
     except Exception as e:
         logger.error(f"Error adding document to vector store: {e}")
         raise RuntimeError(f"Failed to add document to vector store: {str(e)}")
 
-async def search_context(query: str, k: int = 3) -> List[Dict[str, Any]]:
+async def add_document(doc_id: str, text: str, metadata: Dict[str, Any] = None) -> None:
+    """Chunk a document and add it to the vector store."""
+    chunks = chunk_text(text)
+    if not chunks:
+        raise RuntimeError("Failed to add document to vector store: document contains no text to index")
+    await add_chunks(doc_id, chunks, metadata=metadata)
+
+async def search_context(query: str, k: int = 3, doc_ids: List[str] | None = None) -> List[Dict[str, Any]]:
     """
     Search for relevant context using the query.
     Args:
         query: The search query
         k: Number of results to return
+        doc_ids: Optional list of document IDs to restrict the search to
     Returns:
         List of documents with their content and metadata
     """
     try:
         collection = _get_chroma_collection()
-        results = collection.query(
-            query_texts=[query],
+        # Filter inside Chroma so only matching chunks are ranked and returned
+        where = {"doc_id": {"$in": doc_ids}} if doc_ids else None
+        results = await asyncio.to_thread(
+            collection.query,
+            **await _query_args([query]),
             n_results=k,
+            where=where,
             include=['documents', 'metadatas', 'distances']
         )
 
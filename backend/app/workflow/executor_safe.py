@@ -1,11 +1,11 @@
 # backend/workflow/executor_safe.py
 import time
-import threading
-from typing import Dict, Any, List
+from collections import ChainMap
+from typing import Any, Awaitable, Callable, Dict, List, NamedTuple, Tuple
 import logging
 import asyncio
-from datetime import datetime
-from .validator import validate_workflow, WorkflowValidationError
+from datetime import datetime, timezone
+from .validator import ValidatedWorkflow, validate_workflow, WorkflowValidationError
 from .user_query import UserQueryComponent
 from .knowledge_base import KnowledgeBaseComponent
 from .llm_engine import LLMEngineComponent
@@ -21,10 +21,6 @@ COMPONENT_MAP = {
     "output": OutputComponent,
 }
 
-# Concurrency / rate limiting for LLM calls (adjust to your resources)
-LLM_CONCURRENCY_LIMIT = 4
-_llm_semaphore = threading.Semaphore(LLM_CONCURRENCY_LIMIT)
-
 # Timeout defaults (seconds)
 NODE_RUNTIME_TIMEOUT = 30  # per-node timeout (LLM nodes may use this)
 
@@ -33,40 +29,57 @@ class NodeExecutionError(Exception):
     pass
 
 
-def _safe_run_node(node_obj, inputs: Dict[str, Any], timeout: float = NODE_RUNTIME_TIMEOUT) -> Dict[str, Any]:
+class PlanStep(NamedTuple):
+    node_id: str
+    node_type: str
+    process: Callable[[Dict[str, Any]], Awaitable[Dict[str, Any]]]
+    parent_ids: Tuple[str, ...]
+
+
+# Steps grouped into layers; the steps within a layer can run concurrently
+ExecutionPlan = List[Tuple[PlanStep, ...]]
+
+
+def compile_workflow(graph: ValidatedWorkflow) -> ExecutionPlan:
     """
-    Synchronously execute node_obj.run(inputs) with a timeout and
-    special handling for LLM nodes using a semaphore.
+    Instantiate every node once and group the steps into layers by depth.
+
+    Every step in a layer has all of its parents in earlier layers. Components
+    only hold their config, so the bound process methods can be shared by every
+    run of the same (cached) graph.
     """
-    # If node is LLMEngineComponent, acquire semaphore
-    is_llm = isinstance(node_obj, LLMEngineComponent)
+    depth: Dict[str, int] = {}
+    layers: List[List[PlanStep]] = []
+    for nid in graph.topo:
+        parent_ids = graph.parents[nid]
+        d = max((depth[p] for p in parent_ids), default=-1) + 1
+        depth[nid] = d
+
+        node_meta = graph.nodes_meta[nid]
+        node_cls = COMPONENT_MAP.get(node_meta["type"])
+        if node_cls is None:
+            # Skip unknown node types (shouldn't happen after validation)
+            continue
+        while len(layers) <= d:
+            layers.append([])
+        node_instance = node_cls(config=node_meta.get("config", {}))
+        layers[d].append(PlanStep(nid, node_meta["type"], node_instance.process, parent_ids))
+    return [tuple(layer) for layer in layers if layer]
 
-    def _call():
-        return node_obj.run(inputs)
 
-    start = time.perf_counter()
-    if is_llm:
-        acquired = _llm_semaphore.acquire(timeout=timeout)
-        if not acquired:
-            raise NodeExecutionError("Could not acquire LLM semaphore (too many concurrent LLM calls)")
+async def _safe_run_node(step: PlanStep, inputs: Dict[str, Any], timeout: float = NODE_RUNTIME_TIMEOUT) -> Dict[str, Any]:
+    """
+    Await step.process(inputs) with a timeout.
+    """
+    start_ns = time.perf_counter_ns()
     try:
-        # Run the node in a thread and wait with timeout to avoid blocking server
-        from concurrent.futures import ThreadPoolExecutor, TimeoutError
-
-        with ThreadPoolExecutor(max_workers=1) as ex:
-            future = ex.submit(_call)
-            try:
-                result = future.result(timeout=timeout)
-            except TimeoutError:
-                future.cancel()
-                raise NodeExecutionError("Node execution timed out")
-    finally:
-        if is_llm:
-            _llm_semaphore.release()
-    end = time.perf_counter()
-    duration = end - start
-
-    # Expect node.run to return a dict
+        result = await asyncio.wait_for(step.process(inputs), timeout=timeout)
+    except asyncio.TimeoutError:
+        logger.warning("Node %s (%s) timed out after %ss", step.node_id, step.node_type, timeout)
+        raise NodeExecutionError("Node execution timed out")
+    duration = (time.perf_counter_ns() - start_ns) / 1e9
+
+    # Expect node.process to return a dict
     if not isinstance(result, dict):
         raise NodeExecutionError("Node did not return a dict")
     # attach some metadata optionally
@@ -74,72 +87,55 @@ def _safe_run_node(node_obj, inputs: Dict[str, Any], timeout: float = NODE_RUNTI
     return result
 
 
-def execute_workflow_safe(workflow: Dict, user_query: str, trace: List[Dict] = None) -> Dict:
+def _iso(ns: int) -> str:
+    return datetime.fromtimestamp(ns / 1e9, tz=timezone.utc).isoformat(timespec="milliseconds").replace("+00:00", "Z")
+
+
+def _finalize_trace(trace: List[Dict]) -> List[Dict]:
+    """Format the raw start timestamps only once, when the trace is returned."""
+    for entry in trace:
+        if "started_at_ns" in entry:
+            entry["started_at"] = _iso(entry.pop("started_at_ns"))
+    return trace
+
+
+async def execute_workflow_safe(workflow: Dict, user_query: str, trace: List[Dict] = None) -> Dict:
     """
     Validate workflow, compute execution order, run nodes safely, return final result and trace.
     trace: optional list that will be appended with per-node execution entries.
     """
     trace = trace if trace is not None else []
-    # 1. Validate
+    # 1. Validate; the validator hands back the graph and topo order it built
+    # (cached by definition hash, so repeat runs reuse the graph and its plan)
     try:
-        validate_workflow(workflow)
+        graph = validate_workflow(workflow)
     except WorkflowValidationError as v:
         # return structured validation errors in response
         raise
 
-    # Build nodes dict (id -> node metadata)
-    nodes_meta = {n["id"]: n for n in workflow["nodes"]}
-    edges = workflow["edges"]
-
-    # build adjacency and reverse adjacency
-    adj = {nid: [] for nid in nodes_meta}
-    parents = {nid: [] for nid in nodes_meta}
-    for e in edges:
-        adj[e["from"]].append(e["to"])
-        parents[e["to"]].append(e["from"])
-
-    # Get topological order (re-use validator's Kahn if desired, but recompute here)
-    # Simple Kahn's algorithm:
-    incoming = {nid: 0 for nid in nodes_meta}
-    for e in edges:
-        incoming[e["to"]] += 1
-    queue = [nid for nid, c in incoming.items() if c == 0]
-    topo = []
-    while queue:
-        n = queue.pop(0)
-        topo.append(n)
-        for m in adj[n]:
-            incoming[m] -= 1
-            if incoming[m] == 0:
-                queue.append(m)
+    # Compiled once per graph; cached graphs carry their plan between runs
+    if graph.plan is None:
+        graph.plan = compile_workflow(graph)
 
     # Execution context: store output of each node
     context_map: Dict[str, Dict] = {}
 
-    # Initialize start node(s) - find the user_query node(s)
-    user_nodes = [nid for nid, meta in nodes_meta.items() if meta["type"] == "user_query"]
-    if not user_nodes:
+    # Initialize the start node - the validator already located the user_query node
+    if graph.user_query_id is None:
         raise NodeExecutionError("No user_query node found")
-    # We enforce exactly one user_query in validation; take the first
-    start_node_id = user_nodes[0]
-    context_map[start_node_id] = {"query": user_query}
-
-    # Execute nodes in topo order
-    for node_id in topo:
-        node_meta = nodes_meta[node_id]
-        node_type = node_meta["type"]
-        node_cls = COMPONENT_MAP.get(node_type)
-        if node_cls is None:
-            # Skip unknown node types (shouldn't happen after validation)
-            continue
-        node_instance = node_cls(id=node_id, config=node_meta.get("config", {}))
-
-        # Collect inputs by merging outputs from parent nodes (last-wins for same keys)
-        inputs = {}
-        if node_id in parents and parents[node_id]:
-            for p in parents[node_id]:
-                parent_out = context_map.get(p, {}) or {}
-                inputs.update(parent_out)
+    context_map[graph.user_query_id] = {"query": user_query}
+
+    async def run_node(step: PlanStep) -> None:
+        node_id = step.node_id
+
+        # Collect inputs from parent nodes. A single parent's output is passed
+        # by reference (components never mutate their inputs); several are
+        # merged with last-wins for same keys, hence the reversed ChainMap.
+        parent_ids = step.parent_ids
+        if len(parent_ids) == 1:
+            inputs = context_map.get(parent_ids[0]) or {}
+        elif parent_ids:
+            inputs = dict(ChainMap(*((context_map.get(p) or {}) for p in reversed(parent_ids))))
         else:
             # no parents: use initial context if this is start node
             inputs = context_map.get(node_id, {})
@@ -147,15 +143,14 @@ def execute_workflow_safe(workflow: Dict, user_query: str, trace: List[Dict] = N
         # Execute with safe wrapper and record trace
         entry = {
             "node_id": node_id,
-            "node_type": node_type,
-            "started_at": datetime.utcnow().isoformat() + "Z",
+            "node_type": step.node_type,
+            "started_at_ns": time.time_ns(),
         }
         trace.append(entry)
         try:
-            node_start = time.perf_counter()
-            output = _safe_run_node(node_instance, inputs)
-            node_end = time.perf_counter()
-            duration = node_end - node_start
+            node_start_ns = time.perf_counter_ns()
+            output = await _safe_run_node(step, inputs)
+            duration = (time.perf_counter_ns() - node_start_ns) / 1e9
             entry.update({
                 "status": "success",
                 "duration_seconds": duration,
@@ -168,21 +163,27 @@ def execute_workflow_safe(workflow: Dict, user_query: str, trace: List[Dict] = N
                 "status": "error",
                 "error": str(exc),
             })
-            # Stop execution and return a structured error result
-            return {
-                "error": "Node execution error",
-                "node_id": node_id,
-                "node_type": node_type,
-                "error_message": str(exc),
-                "trace": trace,
-            }
+            raise
+
+    # Run layer by layer; a layer's steps are independent of each other
+    for layer in graph.plan:
+        results = await asyncio.gather(*(run_node(step) for step in layer), return_exceptions=True)
+        for step, res in zip(layer, results):
+            if isinstance(res, Exception):
+                # Stop execution and return a structured error result
+                return {
+                    "error": "Node execution error",
+                    "node_id": step.node_id,
+                    "node_type": step.node_type,
+                    "error_message": str(res),
+                    "trace": _finalize_trace(trace),
+                }
 
     # At the end, gather outputs of output node(s)
-    output_nodes = [nid for nid, meta in nodes_meta.items() if meta["type"] == "output"]
-    final_outputs = [context_map.get(nid, {}) for nid in output_nodes]
+    final_outputs = [context_map.get(nid, {}) for nid in graph.output_ids]
     # If multiple output nodes merge them or return first
     final = final_outputs[0] if final_outputs else {}
     return {
         "result": final,
-        "trace": trace
+        "trace": _finalize_trace(trace)
     }
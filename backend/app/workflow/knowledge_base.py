@@ -1,5 +1,65 @@
-from typing import Dict, Any
-from app.services.vector_store import search_documents
+from typing import Dict, Any, List, Optional, Tuple
+import asyncio
+from app.services.vector_store import batched_search
+
+# Lookups arriving within this window (or until the batch is full) share one vector store call
+SEARCH_BATCH_WINDOW = 0.01  # seconds
+SEARCH_BATCH_SIZE = 32
+# Upper bound on top_k, so one node can't inflate n_results for its whole batch
+MAX_TOP_K = 20
+
+class AsyncBatcher:
+    """Coalesce concurrent (query, k) searches into batched_search calls."""
+
+    def __init__(self, max_size: int, max_delay: float):
+        self.max_size = max_size
+        self.max_delay = max_delay
+        self._pending: List[Tuple[asyncio.Future, str, int]] = []
+        self._full: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+
+    async def search(self, query: str, k: int) -> List[Dict[str, Any]]:
+        loop = asyncio.get_running_loop()
+        fut = loop.create_future()
+        self._pending.append((fut, query, k))
+        if self._task is None or self._task.done():
+            # Flush loop is started lazily and exits once nothing is pending
+            self._full = asyncio.Event()
+            self._task = loop.create_task(self._run())
+        elif len(self._pending) >= self.max_size:
+            self._full.set()
+        return await fut
+
+    async def _run(self) -> None:
+        while self._pending:
+            if len(self._pending) < self.max_size:
+                try:
+                    await asyncio.wait_for(self._full.wait(), self.max_delay)
+                except asyncio.TimeoutError:
+                    pass
+            self._full.clear()
+            batch = self._pending[:self.max_size]
+            self._pending = self._pending[self.max_size:]
+            await self._flush(batch)
+
+    async def _flush(self, batch: List[Tuple[asyncio.Future, str, int]]) -> None:
+        try:
+            results = await batched_search([(query, k) for _, query, k in batch])
+        except Exception as e:
+            if len(batch) == 1:
+                fut = batch[0][0]
+                if not fut.done():
+                    fut.set_exception(e)
+                return
+            # Retry one by one so a bad lookup only fails its own caller
+            await asyncio.gather(*(self._flush([item]) for item in batch))
+            return
+        for (fut, _, _), result in zip(batch, results):
+            # Skip callers that gave up (e.g. node timeout) while the batch ran
+            if not fut.done():
+                fut.set_result(result)
+
+_batcher = AsyncBatcher(SEARCH_BATCH_SIZE, SEARCH_BATCH_WINDOW)
 
 class KnowledgeBaseComponent:
     def __init__(self, config: Dict[str, Any]):
@@ -11,9 +71,11 @@ class KnowledgeBaseComponent:
             
         query = input_data["query"]
         k = self.config.get("top_k", 3)
+        if not isinstance(k, int) or isinstance(k, bool) or not 1 <= k <= MAX_TOP_K:
+            raise ValueError(f"top_k must be an integer between 1 and {MAX_TOP_K}")
         
         try:
-            results = await search_documents(query, k)
+            results = await _batcher.search(query, k)
             return {
                 "query": query,
                 "context": results,
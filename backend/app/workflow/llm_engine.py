@@ -1,19 +1,24 @@
-from typing import Dict, Any
+from typing import Any, AsyncIterator, Dict, List, Tuple
+import asyncio
 import logging
-from openai import OpenAI
 from os import getenv
 
+from app.services import llm_cache
+from app.services.llm_service import create_chat_completion, is_llm_available, stream_chat_completion
+
 logger = logging.getLogger(__name__)
 
+# Caps concurrent LLM API calls only; other nodes keep running while these wait
+_LLM_SEM = asyncio.Semaphore(int(getenv("LLM_CONCURRENCY", "4")))
+
 class LLMEngineComponent:
     def __init__(self, config: Dict[str, Any]):
         self.config = config
-        self.client = OpenAI(api_key=getenv("OPENAI_API_KEY"))
         self.model = config.get("model", "gpt-3.5-turbo")
         self.temperature = config.get("temperature", 0.0)
         self.max_tokens = config.get("max_tokens", 800)
 
-    async def process(self, input_data: Dict[str, Any]) -> Dict[str, Any]:
+    def _prepare(self, input_data: Dict[str, Any]) -> Tuple[str, List[Dict[str, str]], List[Any], Dict[str, Any]]:
         if not input_data or "query" not in input_data:
             raise ValueError("Input must contain 'query'")
 
@@ -36,19 +41,82 @@ class LLMEngineComponent:
         else:
             messages.append({"role": "user", "content": query})
 
+        sources = [doc.get("id") for doc in context] if context else []
+        params = {"model": self.model, "temperature": self.temperature, "max_tokens": self.max_tokens}
+        return query, messages, sources, params
+
+    async def process(self, input_data: Dict[str, Any]) -> Dict[str, Any]:
+        query, messages, sources, params = self._prepare(input_data)
+        cached = await llm_cache.get(query, messages, sources, params)
+        if cached is not None:
+            return {"answer": cached, "sources": sources}
+
         try:
-            response = self.client.chat.completions.create(
-                model=self.model,
-                messages=messages,
-                temperature=self.temperature,
-                max_tokens=self.max_tokens
-            )
-            
+            if not is_llm_available():
+                raise RuntimeError("OpenAI API key not configured")
+            async with _LLM_SEM:
+                # Shared app-wide AsyncOpenAI client: one HTTP/2 pool, retried on transient errors
+                response = await create_chat_completion(
+                    model=self.model,
+                    messages=messages,
+                    temperature=self.temperature,
+                    max_tokens=self.max_tokens
+                )
+
+            answer = response.choices[0].message.content.strip()
+            llm_cache.put(query, messages, sources, params, answer)
             return {
-                "answer": response.choices[0].message.content.strip(),
-                "sources": [doc.get("id") for doc in context] if context else []
+                "answer": answer,
+                "sources": sources
             }
             
         except Exception as e:
             logger.error(f"LLM processing failed: {str(e)}")
-            raise RuntimeError(f"LLM processing failed: {str(e)}")
\ No newline at end of file
+            raise RuntimeError(f"LLM processing failed: {str(e)}")
+
+    async def process_stream(self, input_data: Dict[str, Any]) -> AsyncIterator[str]:
+        """Like process, but yields the answer text as the model generates it."""
+        query, messages, sources, params = self._prepare(input_data)
+        cached = await llm_cache.get(query, messages, sources, params)
+        if cached is not None:
+            yield cached
+            return
+
+        queue: asyncio.Queue = asyncio.Queue()
+
+        async def pump() -> None:
+            # Drains the API stream at network speed, so a slow SSE client
+            # never keeps an LLM slot busy; None marks the end of the stream
+            try:
+                async with _LLM_SEM:
+                    async for delta in stream_chat_completion(
+                        model=self.model,
+                        messages=messages,
+                        temperature=self.temperature,
+                        max_tokens=self.max_tokens
+                    ):
+                        queue.put_nowait(delta)
+            except Exception as e:
+                queue.put_nowait(e)
+            else:
+                queue.put_nowait(None)
+
+        parts = []
+        try:
+            if not is_llm_available():
+                raise RuntimeError("OpenAI API key not configured")
+            task = asyncio.create_task(pump())
+            try:
+                while (item := await queue.get()) is not None:
+                    if isinstance(item, Exception):
+                        raise item
+                    parts.append(item)
+                    yield item
+            finally:
+                # Client went away mid-answer: stop reading from the API
+                task.cancel()
+        except Exception as e:
+            logger.error(f"LLM processing failed: {str(e)}")
+            raise RuntimeError(f"LLM processing failed: {str(e)}")
+
+        llm_cache.put(query, messages, sources, params, "".join(parts).strip())
@@ -1,4 +1,4 @@
-from typing import Dict, Any
+from typing import Any, AsyncIterator, Dict, List, Optional
 import logging
 
 logger = logging.getLogger(__name__)
@@ -33,4 +33,14 @@ class OutputComponent:
 
         except Exception as e:
             logger.error(f"Error in output component: {str(e)}")
-            raise RuntimeError(f"Output processing failed: {str(e)}")
\ No newline at end of file
+            raise RuntimeError(f"Output processing failed: {str(e)}")
+
+    async def process_stream(self, chunks: AsyncIterator[str], sources: Optional[List[str]] = None) -> AsyncIterator[str]:
+        """Format a streamed answer as it arrives (text format only; json needs the whole answer)."""
+        if self.format == "json":
+            raise ValueError("JSON output can't be streamed; use process()")
+
+        async for chunk in chunks:
+            yield chunk
+        if sources:
+            yield f"\nSources: {', '.join(sources)}"
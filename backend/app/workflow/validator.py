@@ -1,7 +1,15 @@
 # backend/workflow/validator.py
-from typing import Dict, List, Set, Tuple
+import hashlib
+import json
+import threading
+from collections import deque
+from typing import Any, Dict, List, Literal, Optional, Tuple
 from dataclasses import dataclass
 
+import orjson
+from cachetools import LRUCache
+from pydantic import BaseModel, Field, ValidationError as PydanticValidationError, conlist, constr
+
 
 @dataclass
 class ValidationErrorItem:
@@ -9,145 +17,192 @@ class ValidationErrorItem:
     message: str
 
 
+@dataclass
+class ValidatedWorkflow:
+    topo: List[str]
+    adj: Dict[str, List[str]]
+    parents: Dict[str, Tuple[str, ...]]
+    nodes_meta: Dict[str, Dict]
+    user_query_id: Optional[str]
+    output_ids: List[str]
+    # executor_safe.ExecutionPlan, compiled on first run and cached with the graph
+    plan: Optional[list] = None
+
+
 class WorkflowValidationError(Exception):
     def __init__(self, errors: List[ValidationErrorItem]):
         self.errors = errors
         super().__init__("Workflow validation failed")
 
 
-NODE_TYPES = {"user_query", "knowledge_base", "llm_engine", "output"}
+NodeType = Literal["user_query", "knowledge_base", "llm_engine", "output"]
 
 # minimal required config per node type (extend as needed)
 REQUIRED_NODE_CONFIG = {
-    "knowledge_base": [],  # e.g., ["collection_name"]
-    "llm_engine": [],      # e.g., ["model"]
-    "user_query": [],
-    "output": [],
+    "knowledge_base": (),  # e.g., ("collection_name",)
+    "llm_engine": (),      # e.g., ("model",)
+    "user_query": (),
+    "output": (),
 }
 
 # safety limits
 MAX_NODES = 50
 MAX_EDGES = 200
 
+# validated graphs keyed by definition hash: workflows are saved once and run
+# many times, so repeat runs skip straight to execution. Editing a workflow
+# changes its hash, so stale entries are simply never hit again.
+VALIDATION_CACHE_SIZE = 512
+_VALIDATION_CACHE: "LRUCache[str, ValidatedWorkflow]" = LRUCache(maxsize=VALIDATION_CACHE_SIZE)
+_validation_cache_lock = threading.Lock()
+
+
+# Shape and type rules, checked in one pydantic-core pass; extra keys (e.g. UI
+# positions) are ignored. Cross-references and graph structure are checked below.
+class NodeModel(BaseModel):
+    id: constr(min_length=1)
+    type: NodeType
+    config: Dict[str, Any] = {}
+
+
+class EdgeModel(BaseModel):
+    from_: constr(min_length=1) = Field(alias="from")
+    to: constr(min_length=1)
+
+
+class WorkflowModel(BaseModel):
+    nodes: conlist(NodeModel, max_length=MAX_NODES)
+    edges: conlist(EdgeModel, max_length=MAX_EDGES)
+
+
+def definition_hash(workflow: Dict) -> str:
+    """Stable content hash of a workflow definition (key order independent)."""
+    try:
+        canonical = orjson.dumps(workflow, option=orjson.OPT_SORT_KEYS | orjson.OPT_NON_STR_KEYS, default=str)
+    except TypeError:
+        # orjson rejects integers outside the 64-bit range; json handles any int
+        canonical = json.dumps(workflow, sort_keys=True, separators=(",", ":"), default=str).encode()
+    return hashlib.blake2b(canonical, digest_size=16).hexdigest()
+
+
+def _error_field(loc: Tuple) -> str:
+    """Render a pydantic error location as e.g. 'nodes[1].config'."""
+    field = ""
+    for part in loc:
+        field += f"[{part}]" if isinstance(part, int) else (f".{part}" if field else str(part))
+    return field or "workflow"
+
 
 def validate_shape(workflow: Dict) -> List[ValidationErrorItem]:
-    errors: List[ValidationErrorItem] = []
-    if not isinstance(workflow, dict):
-        errors.append(ValidationErrorItem("workflow", "Workflow must be a JSON object"))
-        return errors
-
-    if "nodes" not in workflow or not isinstance(workflow["nodes"], list):
-        errors.append(ValidationErrorItem("nodes", "Missing 'nodes' list"))
-    if "edges" not in workflow or not isinstance(workflow["edges"], list):
-        errors.append(ValidationErrorItem("edges", "Missing 'edges' list"))
-    return errors
+    try:
+        WorkflowModel.model_validate(workflow)
+    except PydanticValidationError as e:
+        return [ValidationErrorItem(_error_field(err["loc"]), err["msg"]) for err in e.errors()]
+    return []
 
 
 def validate_nodes_and_edges(workflow: Dict) -> List[ValidationErrorItem]:
+    """Cross-reference checks the schema can't express; assumes validate_shape passed."""
     errors: List[ValidationErrorItem] = []
-    nodes = workflow.get("nodes", [])
-    edges = workflow.get("edges", [])
-
-    if len(nodes) > MAX_NODES:
-        errors.append(ValidationErrorItem("nodes", f"Too many nodes (max {MAX_NODES})"))
-    if len(edges) > MAX_EDGES:
-        errors.append(ValidationErrorItem("edges", f"Too many edges (max {MAX_EDGES})"))
+    nodes = workflow["nodes"]
+    edges = workflow["edges"]
 
     ids = set()
     for idx, n in enumerate(nodes):
-        if not isinstance(n, dict):
-            errors.append(ValidationErrorItem(f"nodes[{idx}]", "Node must be an object"))
-            continue
-        nid = n.get("id")
-        ntype = n.get("type")
-        if not nid or not isinstance(nid, str):
-            errors.append(ValidationErrorItem(f"nodes[{idx}].id", "Node must have a string 'id'"))
-        else:
-            if nid in ids:
-                errors.append(ValidationErrorItem(f"nodes[{idx}].id", f"Duplicate node id '{nid}'"))
-            ids.add(nid)
-        if ntype not in NODE_TYPES:
-            errors.append(ValidationErrorItem(f"nodes[{idx}].type", f"Invalid or missing node type '{ntype}'"))
-
-        # config presence check
-        config = n.get("config", {})
-        if not isinstance(config, dict):
-            errors.append(ValidationErrorItem(f"nodes[{idx}].config", "Config must be an object"))
+        nid = n["id"]
+        # set size only grows for ids we haven't seen
+        prev_len = len(ids)
+        ids.add(nid)
+        if len(ids) == prev_len:
+            errors.append(ValidationErrorItem(f"nodes[{idx}].id", f"Duplicate node id '{nid}'"))
 
         # required keys check if defined
-        required = REQUIRED_NODE_CONFIG.get(ntype, [])
-        for key in required:
+        config = n.get("config", {})
+        for key in REQUIRED_NODE_CONFIG[n["type"]]:
             if key not in config:
                 errors.append(ValidationErrorItem(f"nodes[{idx}].config.{key}", f"Missing required config '{key}'"))
 
-    # Validate edges reference existing node ids and shape
-    node_ids = ids
+    # Validate edges reference existing node ids
     for idx, e in enumerate(edges):
-        if not isinstance(e, dict):
-            errors.append(ValidationErrorItem(f"edges[{idx}]", "Edge must be an object with 'from' and 'to'"))
-            continue
-        src = e.get("from")
-        tgt = e.get("to")
-        if not src or not isinstance(src, str):
-            errors.append(ValidationErrorItem(f"edges[{idx}].from", "Missing/invalid 'from'"))
-        elif src not in node_ids:
-            errors.append(ValidationErrorItem(f"edges[{idx}].from", f"Unknown node id '{src}'"))
-        if not tgt or not isinstance(tgt, str):
-            errors.append(ValidationErrorItem(f"edges[{idx}].to", "Missing/invalid 'to'"))
-        elif tgt not in node_ids:
-            errors.append(ValidationErrorItem(f"edges[{idx}].to", f"Unknown node id '{tgt}'"))
+        if e["from"] not in ids:
+            errors.append(ValidationErrorItem(f"edges[{idx}].from", f"Unknown node id '{e['from']}'"))
+        if e["to"] not in ids:
+            errors.append(ValidationErrorItem(f"edges[{idx}].to", f"Unknown node id '{e['to']}'"))
 
     return errors
 
 
-def find_roots_and_leaves(workflow: Dict) -> Tuple[Set[str], Set[str]]:
-    nodes = workflow.get("nodes", [])
-    edges = workflow.get("edges", [])
-    node_ids = {n["id"] for n in nodes}
-    incoming = {nid: 0 for nid in node_ids}
-    outgoing = {nid: 0 for nid in node_ids}
-    for e in edges:
-        incoming[e["to"]] += 1
-        outgoing[e["from"]] += 1
-    roots = {nid for nid, c in incoming.items() if c == 0}
-    leaves = {nid for nid, c in outgoing.items() if c == 0}
-    return roots, leaves
+# (nodes_meta, types_by_id, adj, parents, incoming)
+Graph = Tuple[
+    Dict[str, Dict],
+    Dict[str, str],
+    Dict[str, List[str]],
+    Dict[str, Tuple[str, ...]],
+    Dict[str, int],
+]
 
 
-def detect_cycles_and_toposort(workflow: Dict) -> Tuple[List[str], List[ValidationErrorItem]]:
+def _build_graph(workflow: Dict) -> Graph:
     """
-    Kahn's algorithm to detect cycles and return topo order.
-    Returns (topo_order, errors). If cycles found, errors contains details.
+    Build every per-node structure the checks need in one pass over nodes and
+    one pass over edges. Assumes validate_nodes_and_edges already passed.
     """
-    errors: List[ValidationErrorItem] = []
-    nodes = workflow.get("nodes", [])
-    edges = workflow.get("edges", [])
-
-    node_ids = [n["id"] for n in nodes]
-    incoming = {nid: 0 for nid in node_ids}
-    adj = {nid: [] for nid in node_ids}
-    for e in edges:
+    nodes_meta: Dict[str, Dict] = {}
+    types_by_id: Dict[str, str] = {}
+    adj: Dict[str, List[str]] = {}
+    parent_lists: Dict[str, List[str]] = {}
+    incoming: Dict[str, int] = {}
+    for n in workflow.get("nodes", []):
+        nid = n["id"]
+        nodes_meta[nid] = n
+        types_by_id[nid] = n["type"]
+        adj[nid] = []
+        parent_lists[nid] = []
+        incoming[nid] = 0
+    for e in workflow.get("edges", []):
         src = e["from"]
         tgt = e["to"]
-        incoming[tgt] += 1
         adj[src].append(tgt)
+        parent_lists[tgt].append(src)
+        incoming[tgt] += 1
+    # frozen once here; every execution of this (cached) graph reads them as-is
+    parents = {nid: tuple(ps) for nid, ps in parent_lists.items()}
+    return nodes_meta, types_by_id, adj, parents, incoming
+
+
+def detect_cycles_and_toposort(
+    adj: Dict[str, List[str]], incoming: Dict[str, int]
+) -> Tuple[List[str], List[ValidationErrorItem]]:
+    """
+    Kahn's algorithm to detect cycles and return topo order.
+    Returns (topo, errors); if cycles found, errors contains details.
+    """
+    errors: List[ValidationErrorItem] = []
 
-    queue = [nid for nid in node_ids if incoming[nid] == 0]
+    # peel a copy so the caller's in-degree counts stay intact
+    remaining = dict(incoming)
+    queue = deque(nid for nid, c in remaining.items() if c == 0)
     topo = []
     while queue:
-        n = queue.pop(0)
+        n = queue.popleft()
         topo.append(n)
         for m in adj[n]:
-            incoming[m] -= 1
-            if incoming[m] == 0:
+            remaining[m] -= 1
+            if remaining[m] == 0:
                 queue.append(m)
 
-    if len(topo) != len(node_ids):
+    if len(topo) != len(adj):
         errors.append(ValidationErrorItem("workflow", "Cycle detected in workflow (graph is not a DAG)"))
     return topo, errors
 
 
-def validate_workflow(workflow: Dict, require_single_user_query: bool = True) -> None:
+def validate_workflow(workflow: Dict, require_single_user_query: bool = True) -> ValidatedWorkflow:
+    cache_key = f"{definition_hash(workflow)}:{int(require_single_user_query)}"
+    with _validation_cache_lock:
+        cached = _VALIDATION_CACHE.get(cache_key)
+    if cached is not None:
+        return cached
+
     errors: List[ValidationErrorItem] = []
     errors.extend(validate_shape(workflow))
     if errors:
@@ -157,10 +212,9 @@ def validate_workflow(workflow: Dict, require_single_user_query: bool = True) ->
     if errors:
         raise WorkflowValidationError(errors)
 
-    # structural checks
-    roots, leaves = find_roots_and_leaves(workflow)
+    # structural checks, all sharing one pass over nodes and edges
+    nodes_meta, types_by_id, adj, parents, incoming = _build_graph(workflow)
     # require at least one user_query node and at least one output node
-    types_by_id = {n["id"]: n["type"] for n in workflow["nodes"]}
     user_query_nodes = [nid for nid, t in types_by_id.items() if t == "user_query"]
     output_nodes = [nid for nid, t in types_by_id.items() if t == "output"]
     if require_single_user_query and len(user_query_nodes) != 1:
@@ -172,30 +226,35 @@ def validate_workflow(workflow: Dict, require_single_user_query: bool = True) ->
     if user_query_nodes:
         start = user_query_nodes[0]
         reachable = set()
-        # BFS
-        adj = {n["id"]: [] for n in workflow["nodes"]}
-        for e in workflow["edges"]:
-            adj[e["from"]].append(e["to"])
+        # DFS over the shared adjacency; reachable doubles as the visited set
         stack = [start]
         while stack:
             cur = stack.pop()
             if cur in reachable:
                 continue
             reachable.add(cur)
-            for nb in adj.get(cur, []):
-                if nb not in reachable:
-                    stack.append(nb)
-        node_ids = {n["id"] for n in workflow["nodes"]}
-        unreachable = node_ids - reachable
+            stack.extend(adj[cur])
+        unreachable = nodes_meta.keys() - reachable
         if unreachable:
             errors.append(ValidationErrorItem("connectivity", f"Unreachable nodes from user_query: {list(unreachable)}"))
 
     # cycles & topo sort
-    topo, cycle_errors = detect_cycles_and_toposort(workflow)
+    topo, cycle_errors = detect_cycles_and_toposort(adj, incoming)
     errors.extend(cycle_errors)
 
     if errors:
         raise WorkflowValidationError(errors)
 
-    # All checks passed
-    return
+    # All checks passed; hand the graph (with its entry/exit nodes) to the
+    # executor so it isn't rebuilt or rescanned
+    validated = ValidatedWorkflow(
+        topo=topo,
+        adj=adj,
+        parents=parents,
+        nodes_meta=nodes_meta,
+        user_query_id=user_query_nodes[0] if user_query_nodes else None,
+        output_ids=output_nodes,
+    )
+    with _validation_cache_lock:
+        _VALIDATION_CACHE[cache_key] = validated
+    return validated
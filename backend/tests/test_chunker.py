@@ -0,0 +1,19 @@
+import random
+
+from app.services.chunker import chunk_text, iter_chunks
+
+
+def test_iter_chunks_matches_chunk_text_on_joined_pieces():
+    rng = random.Random(0)
+    words = ["alpha", "beta.", "gamma\n", "delta", "\n\n", "x" * 30]
+    for _ in range(200):
+        text = "".join(rng.choice(words) + rng.choice(["", " "]) for _ in range(rng.randint(0, 600)))
+        cuts = sorted(rng.sample(range(len(text) + 1), min(len(text) + 1, rng.randint(0, 8))))
+        pieces = [text[a:b] for a, b in zip([0] + cuts, cuts + [len(text)])]
+        size, overlap = rng.choice([(50, 10), (100, 0), (500, 100)])
+        assert list(iter_chunks(pieces, size, overlap)) == chunk_text(text, size, overlap)
+
+
+def test_iter_chunks_empty_input():
+    assert list(iter_chunks([])) == []
+    assert list(iter_chunks(["", "  "])) == []
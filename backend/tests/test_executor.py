@@ -0,0 +1,94 @@
+import asyncio
+
+import pytest
+
+from app.workflow import executor_safe, validator
+from app.workflow.executor_safe import execute_workflow_safe
+
+WORKFLOW = {
+    "nodes": [
+        {"id": "u", "type": "user_query"},
+        {"id": "k1", "type": "knowledge_base"},
+        {"id": "k2", "type": "knowledge_base"},
+        {"id": "l", "type": "llm_engine"},
+        {"id": "o", "type": "output"},
+    ],
+    "edges": [
+        {"from": "u", "to": "k1"},
+        {"from": "u", "to": "k2"},
+        {"from": "k1", "to": "l"},
+        {"from": "k2", "to": "l"},
+        {"from": "l", "to": "o"},
+    ],
+}
+
+
+class FakeKnowledgeBase:
+    running = 0
+    both_running: asyncio.Event
+
+    def __init__(self, config):
+        self.config = config
+
+    async def process(self, input_data):
+        # Only returns once both siblings are in flight at the same time
+        cls = type(self)
+        cls.running += 1
+        if cls.running == 2:
+            cls.both_running.set()
+        await asyncio.wait_for(cls.both_running.wait(), timeout=1)
+        return {"query": input_data["query"], "context": [], "sources": ["doc"]}
+
+
+class FakeLLM:
+    def __init__(self, config):
+        self.config = config
+
+    async def process(self, input_data):
+        return {"answer": f"A({input_data['query']})", "sources": input_data["sources"]}
+
+
+class FailingLLM(FakeLLM):
+    async def process(self, input_data):
+        raise RuntimeError("boom")
+
+
+@pytest.fixture(autouse=True)
+def fake_components(monkeypatch):
+    # Plans are cached with their graphs, so start from an empty cache
+    validator._VALIDATION_CACHE.clear()
+    FakeKnowledgeBase.running = 0
+    FakeKnowledgeBase.both_running = asyncio.Event()
+    monkeypatch.setitem(executor_safe.COMPONENT_MAP, "knowledge_base", FakeKnowledgeBase)
+    monkeypatch.setitem(executor_safe.COMPONENT_MAP, "llm_engine", FakeLLM)
+    yield
+    validator._VALIDATION_CACHE.clear()
+
+
+@pytest.mark.asyncio
+async def test_sibling_nodes_run_concurrently():
+    res = await execute_workflow_safe(WORKFLOW, "hi")
+
+    assert res["result"]["result"] == "A(hi)\nSources: doc"
+    assert [entry["node_id"] for entry in res["trace"]] == ["u", "k1", "k2", "l", "o"]
+    assert all(entry["status"] == "success" for entry in res["trace"])
+
+
+@pytest.mark.asyncio
+async def test_failing_node_returns_structured_error_with_trace(monkeypatch):
+    monkeypatch.setitem(executor_safe.COMPONENT_MAP, "llm_engine", FailingLLM)
+
+    res = await execute_workflow_safe(WORKFLOW, "hi")
+
+    trace = res.pop("trace")
+    assert res == {
+        "error": "Node execution error",
+        "node_id": "l",
+        "node_type": "llm_engine",
+        "error_message": "boom",
+    }
+    assert [(entry["node_id"], entry["status"]) for entry in trace] == [
+        ("u", "success"), ("k1", "success"), ("k2", "success"), ("l", "error"),
+    ]
+    assert trace[-1]["error"] == "boom"
+    assert all("started_at" in entry and "started_at_ns" not in entry for entry in trace)
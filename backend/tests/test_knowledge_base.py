@@ -0,0 +1,67 @@
+import asyncio
+
+import pytest
+
+from app.workflow import knowledge_base
+from app.workflow.knowledge_base import AsyncBatcher, KnowledgeBaseComponent
+
+
+def _fake_search(calls):
+    async def batched_search(queries):
+        calls.append(list(queries))
+        if any(query == "bad" for query, _ in queries):
+            raise RuntimeError("bad query")
+        return [[{"id": f"{query}:{i}"} for i in range(k)] for query, k in queries]
+    return batched_search
+
+
+@pytest.mark.asyncio
+async def test_concurrent_lookups_share_one_batch(monkeypatch):
+    calls = []
+    monkeypatch.setattr(knowledge_base, "batched_search", _fake_search(calls))
+    batcher = AsyncBatcher(max_size=32, max_delay=0.01)
+
+    a, b = await asyncio.gather(batcher.search("a", 1), batcher.search("b", 2))
+
+    assert calls == [[("a", 1), ("b", 2)]]
+    assert [d["id"] for d in a] == ["a:0"]
+    assert [d["id"] for d in b] == ["b:0", "b:1"]
+
+
+@pytest.mark.asyncio
+async def test_failed_batch_only_fails_the_bad_lookup(monkeypatch):
+    calls = []
+    monkeypatch.setattr(knowledge_base, "batched_search", _fake_search(calls))
+    batcher = AsyncBatcher(max_size=32, max_delay=0.01)
+
+    good, bad = await asyncio.gather(
+        batcher.search("good", 1), batcher.search("bad", 1), return_exceptions=True
+    )
+
+    assert [d["id"] for d in good] == ["good:0"]
+    assert isinstance(bad, RuntimeError)
+    # one batched attempt, then each lookup on its own
+    assert calls[0] == [("good", 1), ("bad", 1)]
+    assert sorted(calls[1:]) == [[("bad", 1)], [("good", 1)]]
+
+
+@pytest.mark.asyncio
+async def test_full_batch_flushes_without_waiting(monkeypatch):
+    calls = []
+    monkeypatch.setattr(knowledge_base, "batched_search", _fake_search(calls))
+    batcher = AsyncBatcher(max_size=2, max_delay=10)
+
+    await asyncio.wait_for(asyncio.gather(batcher.search("a", 1), batcher.search("b", 1)), 1)
+
+    assert calls == [[("a", 1), ("b", 1)]]
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("top_k", ["3", 0, knowledge_base.MAX_TOP_K + 1, True, 2.5])
+async def test_invalid_top_k_is_rejected_before_batching(monkeypatch, top_k):
+    calls = []
+    monkeypatch.setattr(knowledge_base, "batched_search", _fake_search(calls))
+
+    with pytest.raises(ValueError):
+        await KnowledgeBaseComponent({"top_k": top_k}).process({"query": "q"})
+    assert calls == []
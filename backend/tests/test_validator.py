@@ -0,0 +1,94 @@
+import pytest
+
+from app.workflow import validator
+from app.workflow.validator import ValidationErrorItem, WorkflowValidationError, validate_workflow
+
+USER_QUERY = {"id": "u", "type": "user_query"}
+LLM = {"id": "l", "type": "llm_engine"}
+OUTPUT = {"id": "o", "type": "output"}
+
+
+@pytest.fixture(autouse=True)
+def empty_cache():
+    validator._VALIDATION_CACHE.clear()
+    yield
+    validator._VALIDATION_CACHE.clear()
+
+
+def _errors(workflow):
+    with pytest.raises(WorkflowValidationError) as exc_info:
+        validate_workflow(workflow)
+    return exc_info.value.errors
+
+
+def test_non_dict_workflow():
+    assert _errors(["not", "a", "workflow"]) == [
+        ValidationErrorItem("workflow", "Input should be a valid dictionary or instance of WorkflowModel"),
+    ]
+
+
+def test_unknown_node_type():
+    workflow = {
+        "nodes": [USER_QUERY, {"id": "w", "type": "web_search"}, OUTPUT],
+        "edges": [{"from": "u", "to": "o"}],
+    }
+    assert _errors(workflow) == [
+        ValidationErrorItem("nodes[1].type", "Input should be 'user_query', 'knowledge_base', 'llm_engine' or 'output'"),
+    ]
+
+
+def test_duplicate_node_id():
+    workflow = {
+        "nodes": [USER_QUERY, {"id": "u", "type": "output"}, OUTPUT],
+        "edges": [{"from": "u", "to": "o"}],
+    }
+    assert _errors(workflow) == [ValidationErrorItem("nodes[1].id", "Duplicate node id 'u'")]
+
+
+def test_unknown_edge_endpoint():
+    workflow = {
+        "nodes": [USER_QUERY, OUTPUT],
+        "edges": [{"from": "u", "to": "o"}, {"from": "u", "to": "missing"}],
+    }
+    assert _errors(workflow) == [ValidationErrorItem("edges[1].to", "Unknown node id 'missing'")]
+
+
+def test_cycle():
+    workflow = {
+        "nodes": [USER_QUERY, LLM, {"id": "l2", "type": "llm_engine"}, OUTPUT],
+        "edges": [
+            {"from": "u", "to": "l"},
+            {"from": "l", "to": "l2"},
+            {"from": "l2", "to": "l"},
+            {"from": "l2", "to": "o"},
+        ],
+    }
+    assert _errors(workflow) == [
+        ValidationErrorItem("workflow", "Cycle detected in workflow (graph is not a DAG)"),
+    ]
+
+
+def test_valid_workflow_graph():
+    workflow = {
+        "nodes": [OUTPUT, LLM, USER_QUERY],
+        "edges": [{"from": "l", "to": "o"}, {"from": "u", "to": "l"}],
+    }
+    graph = validate_workflow(workflow)
+
+    assert graph.topo == ["u", "l", "o"]
+    assert graph.parents == {"u": (), "l": ("u",), "o": ("l",)}
+    assert graph.user_query_id == "u"
+    assert graph.output_ids == ["o"]
+
+
+def test_cached_definition_returns_same_graph_and_plan():
+    workflow = {"nodes": [USER_QUERY, LLM, OUTPUT], "edges": [{"from": "u", "to": "l"}, {"from": "l", "to": "o"}]}
+    graph = validate_workflow(workflow)
+    graph.plan = ["compiled"]
+
+    # Same content, different key order: same cache entry
+    reordered = {"edges": [{"to": "l", "from": "u"}, {"to": "o", "from": "l"}], "nodes": [USER_QUERY, LLM, OUTPUT]}
+    again = validate_workflow(reordered)
+
+    assert again is graph
+    assert again.plan == ["compiled"]